@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+Рассылка уведомлений в двух движках: Delivery на потоках против AsyncDelivery на asyncio
+
+Оба отправляют в локальный сервер, который отвечает как Bot API с задержкой --latency,
+лимиты Telegram подняты, чтобы мерить сам движок. Процессорное время
+включает и сервер, он одинаков для обоих движков.
+
+    python -m benchmarks.engines [--messages 2000] [--workers 4 16 64] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import aiohttp
+import aiohttp.web
+import telegram
+
+from objects.delivery import Delivery
+from objects.engine import AsyncDelivery
+
+TOKEN = '123:benchmark'
+
+
+class FakeBotApi:
+    def __init__(self, latency: float, port: int = 8765):
+        """ Bot API в отдельном потоке: каждый метод отвечает отправленным сообщением через latency секунд """
+
+        self.latency = latency
+        self.url = f'http://127.0.0.1:{port}/bot'
+        self.requests = 0
+
+        self.__port__ = port
+        self.__ready__ = threading.Event()
+        self.__loop__ = None
+
+    async def __handle__(self, request):
+        # python-telegram-bot шлёт JSON, AsyncDelivery форму
+        data = await request.json() if request.content_type == 'application/json' else await request.post()
+        await asyncio.sleep(self.latency)
+        self.requests += 1
+
+        return aiohttp.web.json_response({'ok': True, 'result': {
+            'message_id': self.requests,
+            'date': int(time.time()),
+            'chat': {'id': int(data['chat_id']), 'type': 'private'},
+            'text': data.get('text', ''),
+        }})
+
+    def run(self):
+        threading.Thread(target=self.__serve__, daemon=True).start()
+        self.__ready__.wait()
+
+    def __serve__(self):
+        self.__loop__ = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.__loop__)
+
+        app = aiohttp.web.Application()
+        app.router.add_post('/bot{token}/{method}', self.__handle__)
+
+        runner = aiohttp.web.AppRunner(app, access_log=None)
+        self.__loop__.run_until_complete(runner.setup())
+        self.__loop__.run_until_complete(aiohttp.web.TCPSite(runner, '127.0.0.1', self.__port__).start())
+
+        self.__ready__.set()
+        self.__loop__.run_forever()
+
+
+def wait_sent(delivery: Delivery, count: int, timeout: float = 600):
+    """ Ждать, пока все отправки завершатся, успешно или нет """
+
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        stats = delivery.stats()
+
+        if sum(stats.get(name, 0) for name in ('sent', 'error', 'bad_request', 'unauthorized', 'dropped')) >= count:
+            break
+
+        time.sleep(0.01)
+
+
+def submit_all(delivery: Delivery, count: int):
+    for chat_id in range(count):
+        delivery.submit(chat_id, key='task:1', text='*Заказ*\n1 000 руб.', parse_mode='Markdown')
+
+
+def threads(api: FakeBotApi, count: int, workers: int) -> dict:
+    bot = telegram.Bot(TOKEN, base_url=api.url, request=telegram.utils.request.Request(con_pool_size=workers + 4))
+    delivery = Delivery(bot, workers=workers, global_rate=100000, chat_rate=100000)
+    delivery.run()
+
+    submit_all(delivery, count)
+    wait_sent(delivery, count)
+    delivery.stop()
+
+    return delivery.stats()
+
+
+def asyncio_engine(api: FakeBotApi, count: int, workers: int) -> dict:
+    async def main():
+        async with aiohttp.ClientSession() as session:
+            delivery = AsyncDelivery(None, session, TOKEN, workers=workers, global_rate=100000, chat_rate=100000)
+            delivery.__api__ = f'{api.url}{TOKEN}'
+            delivery.run()
+
+            submit_all(delivery, count)
+            await asyncio.get_running_loop().run_in_executor(None, wait_sent, delivery, count)
+            delivery.stop()
+
+            return delivery.stats()
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Notification delivery: threads vs asyncio')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    api = FakeBotApi(args.latency)
+    api.run()
+
+    print(f'{"engine":>8} | {"workers":>7} | {"msg/s":>8} | {"p95 latency, s":>14} | {"cpu, s":>6}')
+
+    for workers in args.workers:
+        for name, engine in (('threads', threads), ('asyncio', asyncio_engine)):
+            cpu, started = os.times(), time.monotonic()
+
+            stats = engine(api, args.messages, workers)
+
+            elapsed = time.monotonic() - started
+            cpu_used = sum(os.times()[:2]) - sum(cpu[:2])
+
+            print(
+                f'{name:>8} | {workers:>7} | {stats.get("sent", 0) / elapsed:>8.1f} | '
+                f'{stats["latency_p95"]:>14.2f} | {cpu_used:>6.2f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Стоимость рассылки одного нового заказа: полный обход пользователей против индекса подписок
+
+    python -m benchmarks.fanout [--users 1000 10000 100000] [--tasks 200]
+"""
+
+import argparse
+import random
+import time
+
+from objects.categories import Categories
+from objects.state import SharedDict
+from objects.subscriptions import Subscriptions
+from objects.user import User
+
+
+def make_users(count: int, subscriptions: Subscriptions) -> SharedDict:
+    """ Каждый третий с уведомлениями, подписан на 3 подкатегории одной категории """
+
+    random.seed(count)
+    categories = list(Categories.tree.items())
+    users = SharedDict()
+
+    for user_id in range(count):
+        category_name, sub_categories = random.choice(categories)
+
+        users[user_id] = User({
+            'id': user_id,
+            'has_notifications': user_id % 3 == 0,
+            'categories': {category_name: {name: True for name in random.sample(sub_categories, 3)}},
+        }, subscriptions)
+
+    return users
+
+
+def scan(users: SharedDict, category_name: str, sub_category_name: str):
+    """ Как до индекса: список пользователей с уведомлениями и проверка подписки каждого """
+
+    return [
+        user.id for user in [user for user in users.values() if user.has_notifications]
+        if user.is_subscribed(category_name, sub_category_name)
+    ]
+
+
+def measure(function, pairs) -> (float, int):
+    """ (мкс на заказ, получателей на заказ) """
+
+    recipients = 0
+    started = time.perf_counter()
+
+    for category_name, sub_category_name in pairs:
+        recipients += len(function(category_name, sub_category_name))
+
+    return (time.perf_counter() - started) / len(pairs) * 1e6, recipients / len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fan-out cost per new task')
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--tasks', type=int, default=200)
+    args = parser.parse_args()
+
+    pairs = [random.choice(list(Categories.bits)) for _ in range(args.tasks)]
+
+    print(f'{"users":>8} | {"recipients":>10} | {"scan, us":>10} | {"index, us":>10} | {"index per recipient, us":>23}')
+
+    for count in args.users:
+        subscriptions = Subscriptions()
+        users = make_users(count, subscriptions)
+
+        scan_time, recipients = measure(lambda *pair: scan(users, *pair), pairs)
+        index_time, _ = measure(subscriptions.get, pairs)
+
+        print(
+            f'{count:>8} | {recipients:>10.1f} | {scan_time:>10.1f} | {index_time:>10.1f} | '
+            f'{index_time / max(recipients, 1):>23.3f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Цены страницы заказов: прежний разбор по одному заказу против CurrencyRate.normalize_prices
+
+Опрос приносит страницу из --page заказов, из них пара новых, остальные
+уже встречались на прошлом опросе. Холодные страницы: все цены новые.
+
+    python -m benchmarks.prices [--page 50] [--polls 2000]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+from objects.currency import CurrencyRate
+
+
+def make_prices(count: int) -> list:
+    random.seed(count)
+
+    return [
+        {'type': 'per_project', 'value': f'{random.randint(1, 300)} {random.choice(("000", "500"))} руб.'}
+        for _ in range(count)
+    ]
+
+
+def per_task(currency: CurrencyRate, prices: list):
+    """ Как было в parse_tasks до normalize_prices """
+
+    for price in prices:
+        price['RUB'] = int(''.join(price['value'].split()[:-1]))
+        price['USD'] = currency.convert(price['RUB'])
+        price['value_usd'] = currency.convert(price['RUB'], beauty=True)
+
+
+def per_page(currency: CurrencyRate, prices: list):
+    currency.normalize_prices(prices)
+
+
+def measure(method, currency: CurrencyRate, pages: list) -> float:
+    """ Микросекунд на страницу """
+
+    # Каждый опрос приносит новые словари цен, как после json.loads
+    pages = [[dict(price) for price in page] for page in pages]
+
+    started = time.perf_counter()
+
+    for page in pages:
+        method(currency, page)
+
+    return (time.perf_counter() - started) / len(pages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Price normalization per page')
+    parser.add_argument('--page', type=int, default=50)
+    parser.add_argument('--polls', type=int, default=2000)
+    args = parser.parse_args()
+
+    prices = make_prices(args.page + args.polls * 2)
+
+    unique = [{'type': 'per_project', 'value': f'{rubles:,} руб.'.replace(',', ' ')} for rubles in range(
+        1000, 1000 + args.page * args.polls // 10
+    )]
+
+    scenarios = (
+        # Окно страницы сдвигается на два новых заказа за опрос
+        ('polling', [prices[poll * 2:poll * 2 + args.page] for poll in range(args.polls)]),
+        ('cold', [unique[start:start + args.page] for start in range(0, len(unique), args.page)]),
+    )
+
+    print(f'{"pages":>7} | {"per task, us":>12} | {"per page, us":>12}')
+
+    for name, pages in scenarios:
+        results = []
+
+        for method in (per_task, per_page):
+            with tempfile.TemporaryDirectory() as root_path:
+                currency = CurrencyRate(root_path, fallback=92.5)
+
+                # lru_cache у __convert__ общий для всех CurrencyRate
+                CurrencyRate.__convert__.cache_clear()
+
+                results.append(measure(method, currency, pages))
+
+        print(f'{name:>7} | {results[0]:>12.1f} | {results[1]:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""
+Сохранение и загрузка User.json() и Task.json() через снимки JsonStorage:
+json стандартной библиотеки, json через orjson и msgpack
+
+Полный круг: объекты -> .json() -> снимок -> записи -> User / Task.
+Форматы, для которых не установлен пакет, пропускаются.
+
+    python -m benchmarks.serializers [--users 200000] [--tasks 50000]
+"""
+
+import argparse
+import io
+import time
+
+from benchmarks import startup, tasks_memory
+from objects import serializers
+from objects.subscriptions import Subscriptions
+from objects.task import Task
+from objects.user import User
+
+FORMATS = (
+    # (название, сериализатор, модуль orjson для JsonSerializer)
+    ('json', 'json', None),
+    ('orjson', 'json', serializers.orjson),
+    ('msgpack', 'msgpack', None),
+)
+
+
+def round_trip(serializer, objects: list, factory) -> (float, float, int):
+    """ (секунд на запись, секунд на чтение, размер снимка в байтах) """
+
+    started = time.perf_counter()
+
+    file = io.BytesIO()
+    serializer.write_snapshot(file, ((item.id, item.json()) for item in objects))
+
+    dumped = time.perf_counter()
+
+    file.seek(0)
+    loaded = [factory(value) for _, value in serializer.read_snapshot(file)]
+
+    assert len(loaded) == len(objects)
+    return dumped - started, time.perf_counter() - dumped, file.getbuffer().nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='User/Task snapshot round trip per serializer')
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--tasks', type=int, default=50000)
+    args = parser.parse_args()
+
+    subscriptions = Subscriptions()
+    collections = (
+        ('users', [User(data, subscriptions) for _, data in startup.make_data(args.users)], User),
+        ('tasks', [Task(data) for data in tasks_memory.make_data(args.tasks)], Task),
+    )
+
+    print(f'{"records":>7} | {"format":>7} | {"dump, s":>7} | {"load, s":>7} | {"size, MB":>8}')
+
+    for name, objects, factory in collections:
+        for format_name, serializer_name, orjson in FORMATS:
+            if serializer_name == 'msgpack' and serializers.msgpack is None:
+                print(f'{name:>7} | {format_name:>7} | msgpack is not installed')
+                continue
+
+            if format_name == 'orjson' and orjson is None:
+                print(f'{name:>7} | {format_name:>7} | orjson is not installed')
+                continue
+
+            saved, serializers.orjson = serializers.orjson, orjson
+
+            try:
+                dump, load, size = round_trip(serializers.serializers[serializer_name](), objects, factory)
+
+            finally:
+                serializers.orjson = saved
+
+            print(f'{name:>7} | {format_name:>7} | {dump:>7.2f} | {load:>7.2f} | {size / 2 ** 20:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
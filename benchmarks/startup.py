@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+Запуск бота: Database.load_data на файле с 500k пользователей, время и пиковый RSS
+
+Файлы генерируются во временной папке: users.json в формате прежних версий
+(indent=2) и снимок JsonStorage. Каждая загрузка идёт в отдельном процессе,
+чтобы пиковый RSS не включал генерацию.
+
+    python -m benchmarks.startup [--users 500000] [--serializer json msgpack]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from objects.cache import TaskCache
+from objects.categories import Categories
+from objects.database import Database
+from objects.state import SharedDict
+from objects.storage import JsonStorage
+from objects.subscriptions import Subscriptions
+
+
+def make_data(count: int):
+    random.seed(count)
+    categories = list(Categories.tree.items())
+
+    for user_id in range(count):
+        category_name, sub_categories = random.choice(categories)
+
+        yield user_id, {
+            'id': user_id,
+            'first_name': f'name{user_id}',
+            'last_name': None,
+            'username': f'user{user_id}',
+            'is_bot': False,
+            'language_code': 'ru',
+            'page': 'main',
+            'has_notifications': user_id % 3 == 0,
+            'auto_answer': False,
+            'categories': {category_name: {name: True for name in sub_categories[:3]}},
+        }
+
+
+def generate(root_path: str, count: int, serializer: str):
+    if serializer == 'baseline':
+        # Так писал Database.save_data до журналов: все подкатегории и indent=2
+        os.makedirs(os.path.join(root_path, 'data'))
+
+        with open(os.path.join(root_path, 'data', 'users.json'), 'w', encoding='utf-8') as file:
+            json.dump({
+                str(key): {**value, 'categories': Categories.to_dict(Categories.from_dict(value['categories']))}
+                for key, value in make_data(count)
+            }, file, ensure_ascii=False, indent=2)
+
+        return
+
+    JsonStorage(root_path, serializer=serializer).compact('users', make_data(count))
+
+
+def peak_rss() -> int:
+    """ Пиковый RSS процесса в килобайтах
+
+    ru_maxrss на Linux переживает fork и exec, поэтому дочерний процесс
+    унаследовал бы пик родителя после генерации. VmHWM считается заново после exec.
+    """
+
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+
+    except OSError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def load(root_path: str):
+    """ Запускается в дочернем процессе, печатает JSON с результатом """
+
+    started = time.perf_counter()
+
+    users = SharedDict()
+    Database(users, TaskCache(), root_path, Subscriptions()).load_data()
+
+    print(json.dumps({
+        'users': len(users),
+        'seconds': time.perf_counter() - started,
+        'peak_rss_mb': peak_rss() / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup load time and peak RSS')
+    parser.add_argument('--users', type=int, default=500000)
+    parser.add_argument('--serializer', nargs='+', default=['baseline', 'json', 'msgpack'])
+    parser.add_argument('--load', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        return load(args.load)
+
+    print(f'{"file":>9} | {"size, MB":>8} | {"users":>7} | {"load, s":>7} | {"peak RSS, MB":>12}')
+
+    for serializer in args.serializer:
+        with tempfile.TemporaryDirectory() as root_path:
+            generate(root_path, args.users, serializer)
+            size = os.path.getsize(os.path.join(root_path, 'data', 'users.json')) / 2 ** 20
+
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.startup', '--load', root_path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+
+            print(
+                f'{serializer:>9} | {size:>8.1f} | {result["users"]:>7} | {result["seconds"]:>7.1f} | '
+                f'{result["peak_rss_mb"]:>12.0f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+Память кэша заказов: обычный класс против Task со __slots__ и сжатыми описанием и автором
+
+    python -m benchmarks.tasks_memory [--tasks 100000]
+"""
+
+import argparse
+import datetime
+import gc
+import random
+import time
+import tracemalloc
+
+from objects.cache import TaskCache
+from objects.static import Static
+from objects.task import Task
+
+WORDS = (
+    'нужно', 'сделать', 'сайт', 'интернет-магазин', 'бота', 'для', 'телеграм', 'парсинг', 'данных', 'с',
+    'админкой', 'и', 'оплатой', 'через', 'API', 'срочно', 'бюджет', 'обсуждается', 'опыт', 'Django',
+)
+
+
+class PlainTask:
+    """ Заказ как до __slots__: все поля, включая описание и автора, лежат в __dict__ как есть """
+
+    def __init__(self, data=None):
+        self.id = data['id']
+        self.title = data['title']
+        self.description = data['description']
+        self.price = data['price']
+        self.date = data['date']
+        self.reply_count = data['reply_count']
+        self.has_responded = data['has_responded']
+        self.is_marked = data['is_marked']
+        self.tags = data['tags']
+        self.safe_deal_only = data['safe_deal_only']
+        self.user = data['user']
+        self.is_publish = data.get('is_publish')
+        self.category_name = data.get('category_name')
+        self.sub_category_name = data.get('sub_category_name')
+        self.published_at = data.get('published_at')
+        self.url = f'{Static.urls["tasks"]}/{self.id}'
+        self.task_comments_count = data.get('task_comments_count')
+        self.page_views_count = data.get('page_views_count')
+
+        if isinstance(self.published_at, str):
+            self.published_at = datetime.datetime.strptime(self.published_at, '%Y-%m-%dT%H:%M:%S')
+
+
+def make_data(count: int):
+    """ Заказы с описанием 300-1500 символов и автором с аватарами, как в ответе API """
+
+    random.seed(count)
+
+    for task_id in range(count):
+        yield {
+            'id': task_id,
+            'title': f'Заказ {task_id}: ' + ' '.join(random.choices(WORDS, k=6)),
+            'description': '<br>'.join(
+                ' '.join(random.choices(WORDS, k=12)) for _ in range(random.randint(4, 16))
+            ),
+            'price': {'type': 'per_project', 'value': f'{random.randint(1, 200)} 000 руб.'},
+            'date': '5 минут назад',
+            'reply_count': random.randint(0, 20),
+            'has_responded': False,
+            'is_marked': False,
+            'tags': [{'name': name} for name in random.sample(WORDS, 3)],
+            'safe_deal_only': False,
+            'user': {
+                'username': f'user{task_id}',
+                'name': f'Имя Фамилия {task_id}',
+                'rating': random.random() * 100,
+                'avatar': {
+                    'src': f'https://freelance.habr.com/assets/users/avatars/{task_id}/r50.png',
+                    'src2x': f'https://freelance.habr.com/assets/users/avatars/{task_id}/r100.png',
+                },
+            },
+            'is_publish': True,
+            'category_name': 'Разработка',
+            'sub_category_name': 'Бэкенд',
+            'published_at': '2026-10-18T08:00:00',
+            'task_comments_count': random.randint(0, 5),
+            'page_views_count': random.randint(0, 500),
+        }
+
+
+def measure(factory, count: int) -> (TaskCache, float):
+    """ (кэш, байт на заказ) без учёта самих входных словарей """
+
+    cache = TaskCache(max_size=count)
+
+    gc.collect()
+    tracemalloc.start()
+
+    before = tracemalloc.get_traced_memory()[0]
+
+    for data in make_data(count):
+        cache[data['id']] = factory(data)
+
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+
+    return cache, (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Task cache memory footprint')
+    parser.add_argument('--tasks', type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, factory in (('plain', PlainTask), ('slotted', Task)):
+        cache, footprint = measure(factory, args.tasks)
+        tasks = list(cache.values())[:10000]
+
+        started = time.perf_counter()
+        for task in tasks:
+            task.description, task.user
+        elapsed = (time.perf_counter() - started) / len(tasks) * 1e6
+
+        print(
+            f'{name}: {footprint:,.0f} bytes per task, {footprint * args.tasks / 2 ** 20:,.1f} MiB for '
+            f'{args.tasks} tasks, {elapsed:.1f} us to read description and user'
+        )
+
+        del cache, tasks
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+Разбор published_at: прежний strptime против Task.parse_datetime (fromisoformat)
+
+Бутстрап разбирает строки API с долями секунды и смещением, загрузка
+разбирает сохранённые 'YYYY-MM-DDTHH:MM:SS', в том числе внутри Task().
+
+    python -m benchmarks.timestamps [--values 100000] [--tasks 20000]
+"""
+
+import argparse
+import datetime
+import random
+import time
+
+from benchmarks import tasks_memory
+from objects.task import Task
+
+
+def strptime_api(value: str) -> datetime.datetime:
+    """ Как было в parse_tasks """
+
+    return datetime.datetime.strptime(value.split('.')[0], '%Y-%m-%dT%H:%M:%S')
+
+
+def strptime_stored(value: str) -> datetime.datetime:
+    """ Как было в Task.__init__ и при чтении контрольной точки """
+
+    return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
+
+
+def make_values(count: int) -> (list, list):
+    """ (строки API, сохранённые строки) для одних и тех же моментов """
+
+    random.seed(count)
+    start = datetime.datetime(2020, 1, 1)
+
+    moments = [start + datetime.timedelta(seconds=random.randrange(10 ** 8)) for _ in range(count)]
+
+    api = [f'{moment.isoformat()}.{random.randrange(1000):03}+03:00' for moment in moments]
+    stored = [moment.isoformat(timespec='seconds') for moment in moments]
+
+    return api, stored
+
+
+def measure(method, values: list) -> (float, list):
+    """ (микросекунд на значение, результаты) """
+
+    started = time.perf_counter()
+    results = [method(value) for value in values]
+
+    return (time.perf_counter() - started) / len(values) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='published_at parsing: strptime vs fromisoformat')
+    parser.add_argument('--values', type=int, default=100000)
+    parser.add_argument('--tasks', type=int, default=20000)
+    args = parser.parse_args()
+
+    api, stored = make_values(args.values)
+
+    print(f'{"case":>9} | {"strptime, us":>12} | {"fromisoformat, us":>17} | {"speedup":>7}')
+
+    for name, values, old in (('bootstrap', api, strptime_api), ('load', stored, strptime_stored)):
+        old_time, old_results = measure(old, values)
+        new_time, new_results = measure(Task.parse_datetime, values)
+
+        assert old_results == new_results
+
+        print(f'{name:>9} | {old_time:>12.2f} | {new_time:>17.2f} | {old_time / new_time:>6.1f}x')
+
+    # Загрузка заказов целиком: Task() из сохранённых записей
+    records = [Task(data).json() for data in tasks_memory.make_data(args.tasks)]
+    parse_datetime = Task.__dict__['parse_datetime']
+
+    try:
+        Task.parse_datetime = staticmethod(strptime_stored)
+        old_time, _ = measure(Task, records)
+
+    finally:
+        Task.parse_datetime = parse_datetime
+
+    new_time, _ = measure(Task, records)
+
+    print(f'{"Task()":>9} | {old_time:>12.2f} | {new_time:>17.2f} | {old_time / new_time:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
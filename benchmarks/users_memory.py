@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+Память на пользователя: подписки словарём словарей против битовой маски
+
+    python -m benchmarks.users_memory [--users 100000]
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from objects.categories import Categories
+from objects.user import User
+
+
+class DictUser:
+    """ Пользователь как до маски: обычный класс и {категория: {подкатегория: bool}} у каждого """
+
+    def __init__(self, user_data: dict):
+        self.id = user_data['id']
+
+        self.first_name = user_data.get('first_name')
+        self.last_name = user_data.get('last_name')
+        self.username = user_data.get('username')
+
+        self.is_bot = user_data.get('is_bot')
+        self.language_code = user_data.get('language_code')
+
+        self.page = user_data.get('page') if user_data.get('page') is not None else 'start'
+
+        self.auto_answer = bool(user_data.get('auto_answer'))
+        self.has_notifications = bool(user_data.get('has_notifications'))
+
+        self.categories = Categories.to_dict(Categories.from_dict(user_data.get('categories') or {}))
+
+
+def make_data(count: int):
+    random.seed(count)
+    categories = list(Categories.tree.items())
+
+    for user_id in range(count):
+        category_name, sub_categories = random.choice(categories)
+
+        yield {
+            'id': user_id,
+            'first_name': f'name{user_id}',
+            'username': f'user{user_id}',
+            'language_code': 'ru',
+            'page': 'main',
+            'has_notifications': user_id % 3 == 0,
+            'categories': {category_name: {name: True for name in random.sample(sub_categories, 3)}},
+        }
+
+
+def measure(factory, count: int) -> (list, float):
+    """ (пользователи, байт на пользователя) """
+
+    gc.collect()
+    tracemalloc.start()
+
+    before = tracemalloc.get_traced_memory()[0]
+    users = [factory(data) for data in make_data(count)]
+    after = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+
+    return users, (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-user memory footprint')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--checks', type=int, default=1000000)
+    args = parser.parse_args()
+
+    pairs = [random.choice(list(Categories.bits)) for _ in range(1000)]
+
+    for name, factory, check in (
+        ('dict', DictUser, lambda user, pair: user.categories[pair[0]][pair[1]]),
+        ('mask', User, lambda user, pair: user.mask & Categories.bits[pair]),
+    ):
+        users, footprint = measure(factory, args.users)
+
+        started = time.perf_counter()
+        for i in range(args.checks):
+            check(users[i % len(users)], pairs[i % len(pairs)])
+        elapsed = (time.perf_counter() - started) / args.checks * 1e9
+
+        print(f'{name}: {footprint:,.0f} bytes per user, {elapsed:.0f} ns per subscription check')
+
+        del users
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,30 @@
 # -*- coding: utf-8 -*-
 
-import datetime
+import concurrent.futures
+import itertools
 import json
 import logging
 import os
 import threading
+import time
 import traceback
-from typing import Dict, List
 
 import requests
 import telegram.ext
 
+from objects.cache import TaskCache
+from objects.categories import Categories
+from objects.currency import CurrencyRate
 from objects.database import Database
+from objects.debounce import ReplyDebouncer
+from objects.delivery import Delivery
+from objects.engine import AsyncEngine
+from objects.messages import TaskMessages
+from objects.poller import Poller
+from objects.router import Router
+from objects.state import SharedDict
 from objects.static import Static
+from objects.subscriptions import Subscriptions
 from objects.task import Task
 from objects.user import User
 
@@ -22,6 +34,15 @@ logging.basicConfig(
 
 
 class FreelansimBot:
+    __page_keyboards__ = {
+        'start': Static.main_menu_keyboard,
+        'main': Static.main_menu_keyboard,
+        'auto_answer': Static.auto_answer_keyboard,
+        'choose_category': Static.choose_category_keyboard,
+        'choose_subcategory': Static.choose_subcategory_keyboard,
+        'choose_sub_subcategory': Static.choose_sub_subcategory_keyboard,
+    }
+
     def __init__(self):
         """ FreelansimBot | Бот для автоответов на freelansim.ru"""
 
@@ -38,10 +59,26 @@ class FreelansimBot:
             'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
                           '(KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36',
         }
+        self.__session__.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=8))
+        self.__executor__ = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+        self.__validators__ = {}
+
+        self.__poller__ = Poller()
+        self.__warmed_up__ = False
+        self.__started_at__ = time.monotonic()
+        self.__first_notification__ = None
+
+        self.__router__ = Router()
+        self.__register_routes__()
 
         self.__updater__ = telegram.ext.Updater(self.__config__['token'])
         self.__tg_bot__ = self.__updater__.bot
 
+        # Ответы на быстрые переключения ●/○ склеиваются в одно сообщение
+        self.__replies__ = ReplyDebouncer(
+            self.__tg_bot__.send_message, delay=self.__config__.get('reply_debounce', 1.5)
+        )
+
         self.__updater__.dispatcher.add_handler(
             telegram.ext.CallbackQueryHandler(self.__query_handler__),
         )
@@ -49,16 +86,29 @@ class FreelansimBot:
             telegram.ext.MessageHandler(telegram.ext.Filters.all, self.__message_handler__)
         )
 
-        self.__tasks__: Dict[int, Task] = {}
-        self.__users__: Dict[int, User] = {}
+        self.__tasks__ = TaskCache()
+        self.__users__ = SharedDict()
+        self.__subscriptions__ = Subscriptions()
 
-        self.__threads__: List[threading.Thread] = []
+        self.__delivery__ = Delivery(self.__tg_bot__, on_blocked=self.__on_blocked__)
 
-        self.__dollar_rate__ = self.__get_dollar_rate__()
+        # Сохранённый курс, обновление идёт в фоне после запуска
+        self.__currency__ = CurrencyRate(self.__root_path__, fallback=self.__config__.get('dollar_rate', 75.0))
 
-        self.__db__ = Database(self.__users__, self.__tasks__, self.__root_path__)
+        self.__db__ = Database(
+            self.__users__, self.__tasks__, self.__root_path__, self.__subscriptions__,
+            storage=self.__config__.get('storage', 'json'),
+            lazy_users=self.__config__.get('lazy_users', False),
+            serializer=self.__config__.get('serializer', 'json'),
+        )
         self.__db__.load_data()
-        self.__db__.run_auto_save()
+
+        # Правки уходят через текущий Delivery, асинхронный движок подменяет его при запуске
+        self.__task_messages__ = TaskMessages(
+            self.__db__.get_task,
+            lambda chat_id, **kwargs: self.__delivery__.submit(chat_id, **kwargs),
+            delay=self.__config__.get('update_messages_delay', 30),
+        )
 
         self.__logger__ = logging.getLogger('freelansim_bot')
 
@@ -69,473 +119,388 @@ class FreelansimBot:
 
         query.answer('')
 
-        if command == 'full':
+        if command in ('full', 'short'):
             task_id = int(args[0])
-            task = self.__tasks__.get(task_id)
-
-            if task:
-                try:
-                    query.edit_message_text(
-                        text=task.format_message(full=True),
-                        parse_mode='Markdown',
-                        disable_web_page_preview=True,
-                        reply_markup=telegram.InlineKeyboardMarkup(
-                            [
-                                [
-                                    telegram.InlineKeyboardButton('Скрыть', callback_data=f'short:{task.id}'),
-                                    telegram.InlineKeyboardButton('Обновить', callback_data=f'full:{task.id}')
-                                ],
-                                [
-                                    telegram.InlineKeyboardButton('Убрать', callback_data=f'delete:{task_id}')
-                                ]
-                            ]
-                        )
-                    )
+            full = command == 'full'
+            task = self.__db__.get_task(task_id)
 
-                except telegram.error.BadRequest as error:
-                    self.__log__(error)
-
-            else:
-                try:
-                    query.edit_message_text(
-                        text=f'Информация по заказу устарела\n\n{Static.urls["tasks"]}/{task_id}',
-                        parse_mode='Markdown',
-                        reply_markup=None,
-                    )
-
-                except telegram.error.BadRequest as error:
-                    self.__log__(error)
-
-        elif command == 'short':
-            task_id = int(args[0])
-            task = self.__tasks__.get(task_id)
+            chat_id, message_id = query.message.chat_id, query.message.message_id
 
             if task:
+                self.__tasks__.touch(task_id)
+                text = task.format_message(full=full)
+
                 try:
                     query.edit_message_text(
-                        text=task.format_message(full=False),
+                        text=text,
                         parse_mode='Markdown',
                         disable_web_page_preview=True,
-                        reply_markup=telegram.InlineKeyboardMarkup(
-                            [
-                                [
-                                    telegram.InlineKeyboardButton('Подробнее', callback_data=f'full:{task.id}'),
-                                    telegram.InlineKeyboardButton('Обновить', callback_data=f'short:{task.id}')
-                                ],
-                                [
-                                    telegram.InlineKeyboardButton('Убрать', callback_data=f'delete:{task_id}')
-                                ]
-                            ]
-                        )
+                        reply_markup=Static.task_keyboard(task.id, full=full)
                     )
 
                 except telegram.error.BadRequest as error:
                     self.__log__(error)
 
+                # Дальше сообщение обновляется само при изменении заказа
+                self.__task_messages__.track(task_id, chat_id, message_id, text, full=full)
+
             else:
+                self.__task_messages__.forget(task_id, chat_id, message_id)
+
                 try:
                     query.edit_message_text(
                         text=f'Информация по заказу устарела\n\n{Static.urls["tasks"]}/{task_id}',
                         parse_mode='Markdown',
-                        reply_markup=None
+                        reply_markup=None,
                     )
 
                 except telegram.error.BadRequest as error:
                     self.__log__(error)
 
         elif command == 'delete':
+            self.__task_messages__.forget(int(args[0]), query.message.chat_id, query.message.message_id)
             self.__tg_bot__.delete_message(query.message['chat']['id'], query.message['message_id'])
 
     def __message_handler__(self, bot, update):
         user = self.__get_user__(
             update.message.from_user.to_dict()
         )
-        text = update.message.text
+        text = update.message.text or ''
 
         print(user)
 
-        if text.startswith('/'):
-            if text == '/start':
-                user.set_page('start')
-
-            elif text == '/tasks':
-                return self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.format_tasks_list(self.__tasks__),
-                    parse_mode='Markdown',
-                    disable_web_page_preview=True,
-                )
-
-            elif text == '/stats':
-                return self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.format_stats(self.__tasks__, self.__users__),
-                    parse_mode='Markdown',
-                    disable_web_page_preview=True,
-                )
-
-            elif text.startswith('/start'):
-                _, command = text.split()
-
-                if command.startswith('taskId'):
-                    task_id = command.split('_')[-1]
-
-                    if not task_id.isdigit():
-                        return self.__tg_bot__.send_message(
-                            user.id,
-                            text=f'Неккоректный заказ',
-                            parse_mode='Markdown',
-                            reply_markup=None,
-                        )
-
-                    task = self.__tasks__.get(int(task_id))
-
-                    if task:
-                        return self.__tg_bot__.send_message(
-                            user.id,
-                            task.format_message(event=True),
-                            parse_mode='Markdown',
-                            disable_web_page_preview=True,
-                            reply_markup=telegram.InlineKeyboardMarkup(
-                                [
-                                    [
-                                        telegram.InlineKeyboardButton('Подробнее', callback_data=f'full:{task_id}'),
-                                        telegram.InlineKeyboardButton('Обновить', callback_data=f'short:{task_id}')
-                                    ],
-                                    [
-                                        telegram.InlineKeyboardButton('Убрать', callback_data=f'delete:{task_id}')
-                                    ]
-                                ]
-                            )
-                        )
-
-                    else:
-                        return self.__tg_bot__.send_message(
-                            user.id,
-                            text=f'Информация по заказу устарела\n\n{Static.urls["tasks"]}/{task_id}',
-                            parse_mode='Markdown',
-                            reply_markup=None,
-                        )
-
-        if user.page == 'start':
-            self.__tg_bot__.send_message(
-                user.id,
-                text=Static.strings[user.page],
-                reply_markup=Static.main_menu_keyboard(user),
-                parse_mode='Markdown'
+        self.__router__.dispatch(user, text)
+
+    def __register_routes__(self):
+        """ Маршруты сообщений: команды (page=None) и кнопки страниц пользователя """
+
+        router = self.__router__
+
+        router.add(None, self.__start__, text='/start')
+        router.add(None, self.__tasks_list__, text='/tasks')
+        router.add(None, self.__stats__, text='/stats')
+        router.add(None, self.__start_task__, prefix='/start ')
+
+        router.add('start', self.__welcome__)
+
+        router.add('main', self.__tasks_list__, text='Список задач')
+        router.add('main', self.__notifications_on__, text='Включить уведомления')
+        router.add('main', self.__notifications_off__, text='Отключить уведомления')
+        router.add('main', self.__to_auto_answer__, text='Настройки автоответов')
+        router.add('main', self.__to_choose_category__, text='Выбор категорий')
+        router.add('main', self.__show_page__)
+
+        router.add('auto_answer', self.__to_main__, text='Назад')
+        router.add('auto_answer', self.__show_page__)
+
+        router.add('choose_category', self.__to_main__, text='Назад')
+        router.add('choose_category', self.__to_choose_subcategory__, text='Далее')
+        router.add('choose_category', self.__toggle_category__, prefix='●')
+        router.add('choose_category', self.__toggle_category__, prefix='○')
+        router.add('choose_category', self.__show_page__)
+
+        router.add('choose_subcategory', self.__to_choose_category__, text='Назад')
+        router.add('choose_subcategory', self.__to_main__, text='Готово')
+        router.add('choose_subcategory', self.__to_choose_sub_subcategory__, prefix='Выбрать подкатегории')
+        router.add('choose_subcategory', self.__show_page__)
+
+        router.add('choose_sub_subcategory', self.__to_choose_subcategory__, text='Готово')
+        router.add('choose_sub_subcategory', self.__toggle_subcategory__, prefix='●')
+        router.add('choose_sub_subcategory', self.__toggle_subcategory__, prefix='○')
+        router.add('choose_sub_subcategory', self.__show_page__)
+
+    def __reply__(self, user, text, reply_markup=None, **kwargs):
+        # Отложенный ответ на переключения должен прийти раньше нового
+        self.__replies__.flush(user.id)
+
+        return self.__tg_bot__.send_message(
+            user.id,
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode='Markdown',
+            **kwargs
+        )
+
+    def __show_page__(self, user, text=None):
+        """ Отправить текст текущей страницы пользователя вместе с её клавиатурой """
+
+        page = user.page.partition(':')[0]
+        message_text = Static.strings[page]
+
+        if page == 'auto_answer':
+            message_text = message_text[user.auto_answer]
+
+        return self.__reply__(user, message_text, reply_markup=self.__page_keyboards__[page](user))
+
+    def __start__(self, user, text):
+        user.set_page('start')
+        return self.__welcome__(user, text)
+
+    def __welcome__(self, user, text):
+        self.__show_page__(user)
+        user.set_page('main')
+
+    def __tasks_list__(self, user, text):
+        return self.__reply__(
+            user,
+            self.__db__.recent.render(Static.format_tasks_list),
+            disable_web_page_preview=True,
+        )
+
+    def __stats__(self, user, text):
+        return self.__reply__(
+            user,
+            Static.format_stats(*self.__db__.stats()),
+            disable_web_page_preview=True,
+        )
+
+    def __start_task__(self, user, text):
+        """ /start taskId_<id> из ссылки на заказ """
+
+        command = text.partition(' ')[2].strip()
+
+        if not command.startswith('taskId'):
+            return self.__router__.dispatch_page(user, text)
+
+        task_id = command.split('_')[-1]
+
+        if not task_id.isdigit():
+            return self.__reply__(user, 'Неккоректный заказ')
+
+        task = self.__db__.get_task(int(task_id))
+
+        if task:
+            self.__tasks__.touch(task.id)
+            text = task.format_message(event=True)
+            message = self.__reply__(
+                user,
+                text,
+                reply_markup=Static.task_keyboard(task_id),
+                disable_web_page_preview=True,
             )
-            user.set_page('main')
-
-        elif user.page == 'main':
-            if text == 'Список задач':
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.format_tasks_list(self.__tasks__),
-                    reply_markup=None,
-                    parse_mode='Markdown',
-                    disable_web_page_preview=True
-                )
-
-            elif text == 'Включить уведомления':
-                user.set_notifications(True)
-
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings['turn_on_notifications'],
-                    reply_markup=Static.main_menu_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text == 'Отключить уведомления':
-                user.set_notifications(False)
-
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings['turn_off_notifications'],
-                    reply_markup=Static.main_menu_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text == 'Настройки автоответов':
-                user.set_page('auto_answer')
-
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page][user.auto_answer],
-                    reply_markup=Static.auto_answer_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text == 'Выбор категорий':
-                user.set_page('choose_category')
-
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.choose_category_keyboard(user),
-                    parse_mode='Markdown'
-                )
 
-            else:
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.main_menu_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-        elif user.page == 'auto_answer':
-            if text == 'Назад':
-                user.set_page('main')
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.main_menu_keyboard(user),
-                    parse_mode='Markdown'
-                )
+            self.__task_messages__.track(task.id, message.chat_id, message.message_id, text, event=True)
+            return message
 
-            else:
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page][user.auto_answer],
-                    reply_markup=Static.auto_answer_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-        elif user.page == 'choose_category':
-            if text == 'Назад':
-                user.set_page('main')
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.main_menu_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text == 'Далее':
-                user.set_page('choose_subcategory')
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.choose_subcategory_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text.startswith('●'):
-                _, name = text.split()
-                user.set_category(name, False)
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings['category_off'].format(category=name),
-                    reply_markup=Static.choose_category_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text.startswith('○'):
-                _, name = text.split()
-                user.set_category(name, True)
-
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings['category_on'].format(category=name),
-                    reply_markup=Static.choose_category_keyboard(user),
-                    parse_mode='Markdown'
-                )
+        return self.__reply__(user, f'Информация по заказу устарела\n\n{Static.urls["tasks"]}/{task_id}')
 
-            else:
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.choose_category_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-        elif user.page == 'choose_subcategory':
-            if text == 'Назад':
-                user.set_page('choose_category')
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.choose_category_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text == 'Готово':
-                user.set_page('main')
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.main_menu_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text.startswith('Выбрать подкатегории'):
-                name = text.split('«')[1].rstrip('»')
-
-                if user.categories.get(name):
-                    user.set_page(f'choose_sub_subcategory:{name}')
-
-                    self.__tg_bot__.send_message(
-                        user.id,
-                        text=Static.strings[user.page.split(':')[0]],
-                        reply_markup=Static.choose_sub_subcategory_keyboard(user),
-                        parse_mode='Markdown'
-                    )
+    def __notifications_on__(self, user, text):
+        user.set_notifications(True)
+        return self.__reply__(
+            user, Static.strings['turn_on_notifications'], reply_markup=Static.main_menu_keyboard(user)
+        )
 
-            else:
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.choose_subcategory_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-        elif user.page.startswith('choose_sub_subcategory'):
-            if text == 'Готово':
-                user.set_page('choose_subcategory')
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page],
-                    reply_markup=Static.choose_subcategory_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text.startswith('●'):
-                name = user.page.split(':')[1]
-                subcategory = text.lstrip('●').strip()
-
-                user.set_subcategory(name, subcategory, False)
-
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings['subcategory_off'].format(subcategory=subcategory),
-                    reply_markup=Static.choose_sub_subcategory_keyboard(user),
-                    parse_mode='Markdown'
-                )
-
-            elif text.startswith('○'):
-                name = user.page.split(':')[1]
-                subcategory = text.lstrip('○').strip()
-
-                user.set_subcategory(name, subcategory, True)
-
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings['subcategory_on'].format(subcategory=subcategory),
-                    reply_markup=Static.choose_sub_subcategory_keyboard(user),
-                    parse_mode='Markdown'
-                )
+    def __notifications_off__(self, user, text):
+        user.set_notifications(False)
+        return self.__reply__(
+            user, Static.strings['turn_off_notifications'], reply_markup=Static.main_menu_keyboard(user)
+        )
 
-            else:
-                self.__tg_bot__.send_message(
-                    user.id,
-                    text=Static.strings[user.page.split(':')[0]],
-                    reply_markup=Static.choose_sub_subcategory_keyboard(user),
-                    parse_mode='Markdown'
-                )
+    def __to_main__(self, user, text):
+        user.set_page('main')
+        return self.__show_page__(user)
+
+    def __to_auto_answer__(self, user, text):
+        user.set_page('auto_answer')
+        return self.__show_page__(user)
+
+    def __to_choose_category__(self, user, text):
+        user.set_page('choose_category')
+        return self.__show_page__(user)
+
+    def __to_choose_subcategory__(self, user, text):
+        user.set_page('choose_subcategory')
+        return self.__show_page__(user)
+
+    def __to_choose_sub_subcategory__(self, user, text):
+        name = text.partition('«')[2].rstrip('»')
+
+        if name in Categories.tree:
+            user.set_page(f'choose_sub_subcategory:{name}')
+            return self.__show_page__(user)
+
+    def __toggle_category__(self, user, text):
+        mark, name = text[0], text[1:].strip()
+        enabled = mark == '○'
+
+        user.set_category(name, enabled)
+
+        self.__replies__.add(
+            user.id,
+            name,
+            Static.strings['category_on' if enabled else 'category_off'].format(category=name),
+            reply_markup=Static.choose_category_keyboard(user),
+            parse_mode='Markdown',
+        )
+
+    def __toggle_subcategory__(self, user, text):
+        name = user.page.split(':')[1]
+        mark, subcategory = text[0], text[1:].strip()
+        enabled = mark == '○'
+
+        user.set_subcategory(name, subcategory, enabled)
+
+        self.__replies__.add(
+            user.id,
+            (name, subcategory),
+            Static.strings['subcategory_on' if enabled else 'subcategory_off'].format(subcategory=subcategory),
+            reply_markup=Static.choose_sub_subcategory_keyboard(user),
+            parse_mode='Markdown',
+        )
 
     def __get_user__(self, user_data: dict):
         user_id = user_data['id']
 
-        if user_id in self.__users__:
-            user = self.__users__[user_id]
+        user, created = self.__db__.get_user(user_id), False
+
+        if user is None:
+            user, created = self.__users__.get_or_create(user_id, lambda: User(user_data, self.__subscriptions__))
+
+        if created:
+            self.__db__.add_user(user)
+        else:
             user.update(user_data)
-            return user
 
-        user = User(user_data)
-        self.__users__[user_id] = user
         return user
 
     def __send_event_new_task__(self, task):
         print('NEW TASK', '#', task)
 
-        thr = threading.Thread(target=self.__event_new_task__, args=[task.id], daemon=True)
-        thr.start()
-        self.__threads__.append(thr)
+        if self.__first_notification__ is None:
+            self.__first_notification__ = time.monotonic() - self.__started_at__
+            self.__log__(f'First notification {self.__first_notification__:.2f}s after start')
+
+        self.__event_new_task__(task.id)
 
     def __event_new_task__(self, task_id):
         task = self.__tasks__.get(task_id)
         message_text = task.format_message(event=True)
+
+        # Пока у пользователей открыты уведомления, заказ должен оставаться в кэше
+        self.__tasks__.touch(task_id)
         category_name, sub_category_name = task.category_name, task.sub_category_name
 
-        for user in self.__users_notifications_list__:
-            if user.categories[category_name][sub_category_name]:
-                try:
-                    self.__tg_bot__.send_message(
-                        user.id,
-                        message_text,
-                        parse_mode='Markdown',
-                        disable_web_page_preview=True,
-                        reply_markup=telegram.InlineKeyboardMarkup(
-                            [
-                                [
-                                    telegram.InlineKeyboardButton('Подробнее', callback_data=f'full:{task_id}'),
-                                    telegram.InlineKeyboardButton('Обновить', callback_data=f'short:{task_id}')
-                                ],
-                                [
-                                    telegram.InlineKeyboardButton('Убрать', callback_data=f'delete:{task_id}')
-                                ]
-                            ]
-                        )
-                    )
+        reply_markup = Static.task_keyboard(task_id)
+        track_message = self.__task_messages__.sent(task_id, message_text, event=True)
+
+        for user_id in self.__db__.subscribers(category_name, sub_category_name):
+            self.__delivery__.submit(
+                user_id,
+                key=f'task:{task_id}',
+                text=message_text,
+                parse_mode='Markdown',
+                disable_web_page_preview=True,
+                reply_markup=reply_markup,
+                callback=track_message,
+            )
 
-                except telegram.error.BadRequest as error:
-                    self.__log__(error)
+        self.__log__(self.__delivery__.stats(), 'DELIVERY')
 
-                except telegram.error.Unauthorized as error:
-                    self.__log__(error)
+    def __on_blocked__(self, user_id):
+        user = self.__db__.get_user(user_id)
 
-                    msg = str(error)
-                    if 'bot was blocked by the user' in msg:
-                        user.set_notifications(False)
+        if user:
+            user.set_notifications(False)
 
-    def get_tasks(self, page=1):
-        """ Получить список задачь
-        :return: :list:`Tasks`
+    def __tasks_headers__(self, page=1, version=None, conditional=False):
+        """ Заголовки запроса страницы заказов
+        :param conditional: добавить If-None-Match/If-Modified-Since из прошлого ответа
         """
 
-        data = self.__session__.get(
-            Static.urls['tasks'],
-            headers={
-                'Accept': 'application/json',
-            },
-            params={
-                'per_page': 50,
-                'page': page
-            },
-            timeout=2,
-        ).json()
-
-        data_addition = {obj['id']: {
-            'is_publish': obj['is_publish'],
-            'category_name': obj['category_name'],
-            'sub_category_name': obj['sub_category_name'],
-            'published_at': datetime.datetime.strptime(
-                obj['published_at'].split('.')[0], "%Y-%m-%dT%H:%M:%S"
-            ),
-            'url': obj['url'],
-            'task_comments_count': obj['task_comments_count'],
-            'page_views_count': obj['page_views_count']
-        } for obj in data if obj is not None}
-
-        data = self.__session__.get(
+        headers = {
+            'Accept': 'application/json',
+        }
+
+        if version is not None:
+            headers['X-Version'] = version
+
+        cached = self.__validators__.get((page, version))
+
+        if conditional and cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        return headers
+
+    def __tasks_response__(self, page, version, status_code: int, headers, content: bytes):
+        """ Разобрать ответ на запрос страницы заказов
+        :return: (данные, изменились ли они с прошлого запроса)
+        """
+
+        cached = self.__validators__.get((page, version))
+
+        if status_code == 304 and cached:
+            return json.loads(cached['content']), False
+
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+
+        if etag or last_modified:
+            self.__validators__[(page, version)] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'content': content,
+            }
+
+        return json.loads(content), True
+
+    def __request_tasks__(self, page=1, version=None, conditional=False):
+        """ Запросить страницу заказов
+        :return: (данные, изменились ли они с прошлого запроса)
+        """
+
+        response = self.__session__.get(
             Static.urls['tasks'],
-            headers={
-                'Accept': 'application/json',
-                'X-Version': '1'
-            },
+            headers=self.__tasks_headers__(page, version, conditional),
             params={
                 'per_page': 50,
                 'page': page
             },
             timeout=2,
-        ).json()['tasks']
+        )
+
+        return self.__tasks_response__(page, version, response.status_code, response.headers, response.content)
+
+    def get_tasks(self, page=1, conditional=False):
+        """ Получить список задачь
+        :param conditional: вернуть None, если страница не изменилась с прошлого запроса
+        :return: :list:`Tasks`
+        """
+
+        addition_future = self.__executor__.submit(self.__request_tasks__, page, None, conditional)
+        tasks_future = self.__executor__.submit(self.__request_tasks__, page, '1', conditional)
+
+        addition, addition_modified = addition_future.result()
+        data, modified = tasks_future.result()
+
+        if not (modified or addition_modified):
+            return None
+
+        return self.parse_tasks(addition, data)
+
+    def parse_tasks(self, addition: list, data: dict):
+        """ Объединить ответы обычного запроса и запроса с X-Version: 1
+        :return: :list:`Tasks`
+        """
+
+        data_addition = {obj['id']: obj for obj in addition if obj is not None}
+        data = [task for task in data['tasks'] if task is not None]
 
         for task in data:
-            if task is not None:
-                if task['id'] in data_addition:
-                    local_data = data_addition[task['id']]
-                    task.update(local_data)
+            obj = data_addition.get(task['id'])
+
+            # Считается до разбора: одинаковые ответы API дают одинаковый отпечаток
+            task['fingerprint'] = Task.fingerprint_of(task, obj)
+
+            if obj is not None:
+                task['is_publish'] = obj['is_publish']
+                task['category_name'] = obj['category_name']
+                task['sub_category_name'] = obj['sub_category_name']
+                task['published_at'] = Task.parse_datetime(obj['published_at'])
+                task['url'] = obj['url']
+                task['task_comments_count'] = obj['task_comments_count']
+                task['page_views_count'] = obj['page_views_count']
 
             task['tags'] = list(map(lambda x: x.get('name'), task['tags']))
 
@@ -547,49 +512,170 @@ class FreelansimBot:
                 'src2x': f'{root}{avatar["src2x"]}' if avatar['src2x'].startswith('/assets/') else avatar['src2x'],
             }
 
-            if task['price']['type'].startswith('per'):
-                task['price']['RUB'] = int(''.join(task['price']['value'].split()[:-1]))
-                task['price']['USD'] = self.__convert_to_dollars__(task['price']['RUB'])
-                task['price']['value_usd'] = self.__convert_to_dollars__(
-                    task['price']['RUB'], beauty=True
-                )
-                task['price']['value'] = task['price']['value']
+        # Цены всей страницы нормализуются одним проходом
+        self.__currency__.normalize_prices(
+            [task['price'] for task in data if task['price']['type'].startswith('per')]
+        )
 
         return data
 
     def __listen__(self):
-        """ Слушать сервер
-        :yields: :class:`Event`
-        """
+        """ Слушать сервер """
 
         while True:
+            self.__poller__.wait()
+
+            full = self.__poller__.is_full
+
             try:
-                for event in self.get_tasks():
-                    yield event
+                data = self.get_tasks(conditional=not full)
 
             except requests.exceptions.ConnectionError:
+                self.__poller__.failure()
                 self.__log__('Error updating server...')
+                continue
 
             except requests.exceptions.ReadTimeout:
+                self.__poller__.failure()
                 self.__log__('Read timeout with updating server...')
+                continue
+
+            self.__poller__.success(self.process_tasks(data, full))
+
+    def process_tasks(self, data: list, full=True):
+        """ Обработать опрошенную страницу заказов
+        :param full: пройти всю страницу, а не только до первого известного заказа
+        :return: количество новых заказов
+        """
+
+        new_count = 0
+
+        for element in data or []:
+            task = self.__tasks__.get(element['id'])
+
+            if task is not None:
+                # Заказы идут от новых к старым, дальше только известные
+                if not full:
+                    break
+
+                self.__update_task__(task, element)
+                continue
+
+            new_count += 1
+            task = Task(element)
 
-    def init_tasks(self, pages=10):
-        """ Init load tasks"""
+            if element.get('url'):
+                self.__db__.add_task(task)
+
+                if self.__warmed_up__:
+                    self.__send_event_new_task__(task)
+
+        # Первый опрос только заполняет список заказов, как раньше init_tasks
+        self.__warmed_up__ = True
+
+        return new_count
+
+    def __update_task__(self, task: Task, element: dict):
+        """ Обновить известный заказ, если его данные в API изменились с прошлого опроса """
+
+        if task.fingerprint is not None and task.fingerprint == element['fingerprint']:
+            return
+
+        diff = task.update(Task(element))
+
+        if diff:
+            self.__log__({
+                'id': task.id,
+                'changes': {
+                    key: 'changed' if key in ('description', 'user') else values for key, values in diff.items()
+                },
+            }, 'UPDATE')
+
+            self.__task_messages__.changed(task.id, diff)
+
+    def init_tasks(self, pages=10, workers=4, background=False):
+        """ Init load tasks
+        :param workers: сколько страниц загружать одновременно
+        :param background: загружать в отдельном потоке, не блокируя long_polling
+        """
+
+        if background:
+            thr = threading.Thread(target=self.init_tasks, args=[pages, workers], daemon=True)
+            thr.start()
+            return thr
 
         self.__log__('Start loading tasks...', 'TASKS')
+        started = time.monotonic()
+
+        checkpoint = self.__db__.load_checkpoint()
 
-        for page in range(1, pages + 1):
-            suffix = 'st' if page == 1 else (
-                'nd' if page == 2 else (
-                    'rd' if page == 3 else 'th'
-                )
+        if checkpoint is None or checkpoint.get('pages') != pages:
+            last_published_at = max(
+                (task.published_at for task in self.__tasks__.snapshot().values() if task.published_at is not None),
+                default=None
             )
-            self.__log__(f'Loading {page}{suffix} page...', 'TASKS')
-            for element in self.get_tasks(page=page):
-                task = Task(element)
-                self.__tasks__[task.id] = task
+            checkpoint = {
+                'pages': pages,
+                'done': [],
+                'last_published_at': Task.format_datetime(last_published_at) if last_published_at else None,
+            }
+
+        else:
+            self.__log__(f'Resume loading from checkpoint, {len(checkpoint["done"])} pages done', 'TASKS')
+
+        last_published_at = checkpoint['last_published_at']
+        if last_published_at is not None:
+            last_published_at = Task.parse_datetime(last_published_at)
+
+        remaining = iter([page for page in range(1, pages + 1) if page not in checkpoint['done']])
+        reached = False
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.get_tasks, page): page for page in itertools.islice(remaining, workers)}
+
+            while futures:
+                done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    page = futures.pop(future)
+
+                    try:
+                        data = future.result()
+
+                    except (requests.exceptions.ConnectionError, requests.exceptions.ReadTimeout) as error:
+                        self.__log__(f'Failed to load page {page}: {error}', 'TASKS')
+                        continue
+
+                    for element in data:
+                        task = self.__tasks__.get(element['id'])
+
+                        if task is not None:
+                            self.__update_task__(task, element)
+                        else:
+                            task = Task(element)
+                            self.__db__.add_task(task)
+
+                        if last_published_at and task.published_at and task.published_at <= last_published_at:
+                            reached = True
 
-        self.__log__('Tasks successfully loaded!', 'TASKS')
+                    # Страница считается загруженной только после того, как её заказы на диске
+                    self.__db__.save_data()
+
+                    checkpoint['done'].append(page)
+                    self.__db__.save_checkpoint(checkpoint)
+                    self.__log__(f'Loaded page {page}', 'TASKS')
+
+                if not reached:
+                    for page in itertools.islice(remaining, len(done)):
+                        futures[executor.submit(self.get_tasks, page)] = page
+
+        if reached:
+            self.__log__('Reached already loaded tasks, stop loading', 'TASKS')
+
+        if reached or len(checkpoint['done']) == pages:
+            self.__db__.clear_checkpoint()
+
+        self.__log__(f'Tasks successfully loaded in {time.monotonic() - started:.2f}s!', 'TASKS')
 
     def telegram_polling(self):
         """ Telegram bot """
@@ -603,16 +689,7 @@ class FreelansimBot:
 
         while True:
             try:
-                for element in self.__listen__():
-                    task = Task(element)
-
-                    if task.id not in self.__tasks__:
-                        if element.get('url'):
-                            self.__tasks__[task.id] = task
-                            self.__send_event_new_task__(task)
-
-                    else:
-                        self.__tasks__[task.id].update(task)
+                self.__listen__()
 
             except KeyboardInterrupt:
                 self.__exit__()
@@ -623,22 +700,24 @@ class FreelansimBot:
 
             self.__log__('Restart system...')
 
-    @property
-    def __users_notifications_list__(self):
-        return list(map(
-            lambda user_id: self.__users__[user_id],
-            filter(lambda user_id: self.__users__[user_id].has_notifications, self.__users__)
-        ))
+    def run(self, engine=None):
+        """ Запустить бота
+        :param engine: 'threads' или 'async', по умолчанию из config.json
+        """
+
+        engine = engine or self.__config__.get('engine', 'threads')
 
-    @staticmethod
-    def __get_dollar_rate__():
-        url = 'https://api.exchangeratesapi.io/latest'
-        return requests.get(url, params={'base': 'USD'}).json()['rates']['RUB']
+        self.telegram_polling()
+        self.__currency__.run()
+        self.__task_messages__.run()
 
-    def __convert_to_dollars__(self, rubles: int, beauty=False):
-        if beauty:
-            return '{:,}$'.format(round(rubles / self.__dollar_rate__)).replace(',', ' ')
-        return rubles / self.__dollar_rate__
+        if engine == 'async':
+            return AsyncEngine(self, self.__config__['token']).run()
+
+        self.__delivery__.run()
+        self.__db__.run_auto_save()
+        self.init_tasks(pages=1, background=True)
+        self.long_polling()
 
     def __load_config__(self, path: str):
         with open(path) as file:
@@ -650,13 +729,16 @@ class FreelansimBot:
     def __exit__(self):
         self.__log__('The final exit.')
         self.__session__.close()
+        self.__executor__.shutdown(wait=False)
         self.__updater__.stop()
+        self.__replies__.flush_all()
+        self.__delivery__.stop()
+        self.__currency__.stop()
+        self.__task_messages__.stop()
         self.__db__.exit()
         exit()
 
 
 if __name__ == '__main__':
     bot = FreelansimBot()
-    bot.init_tasks(pages=1)
-    bot.telegram_polling()
-    bot.long_polling()
+    bot.run()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import itertools
+import logging
+import os
+
+from objects.storage import JsonStorage, SqliteStorage
+
+logging.basicConfig(
+    format='[%(asctime)s] %(message)s', level='INFO', datefmt='%Y.%m.%d %H:%M:%S'
+)
+
+
+def migrate(root_path: str, batch_size: int = 10000, serializer: str = 'json'):
+    """ Перенести users.json/tasks.json (вместе с журналами) в data/data.sqlite3 """
+
+    logger = logging.getLogger('freelansim_bot')
+
+    source = JsonStorage(root_path)
+    target = SqliteStorage(root_path, serializer=serializer)
+
+    for name in ('users', 'tasks'):
+        records = source.load(name)
+        count = 0
+
+        while True:
+            batch = dict(itertools.islice(records, batch_size))
+
+            if not batch:
+                break
+
+            target.write(name, batch)
+            count += len(batch)
+
+        logger.info(f'[MIGRATE]: {count} {name} migrated')
+
+    target.compact('tasks', ())
+    target.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate JSON data files to SQLite storage')
+    parser.add_argument('--root', default=os.path.split(os.path.abspath(__file__))[0],
+                        help='directory that contains the data folder')
+    parser.add_argument('--serializer', default='json', choices=['json', 'msgpack'],
+                        help='format of the records in the SQLite data column')
+
+    args = parser.parse_args()
+    migrate(args.root, serializer=args.serializer)
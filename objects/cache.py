@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import datetime
+import logging
+import threading
+import time
+
+
+class TaskCache:
+    def __init__(self, max_size: int = 10000, ttl: float = 7 * 24 * 3600, grace: float = 24 * 3600,
+                 sweep_interval: float = 60):
+        """ TaskCache | Ограниченный кэш заказов: LRU по размеру и TTL по published_at
+
+        Заказы с открытыми сообщениями (touch) не вытесняются в течение grace секунд.
+        """
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.grace = grace
+
+        self.__tasks__ = collections.OrderedDict()
+        self.__pinned__ = {}
+        self.__lock__ = threading.RLock()
+
+        self.__sweep_interval__ = sweep_interval
+        self.__last_sweep__ = time.time()
+        self.__last_report__ = time.time()
+
+        self.__counters__ = collections.Counter()
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+    def get(self, task_id: int, default=None):
+        with self.__lock__:
+            task = self.__tasks__.get(task_id)
+
+            if task is None:
+                self.__counters__['misses'] += 1
+                return default
+
+            self.__counters__['hits'] += 1
+            self.__tasks__.move_to_end(task_id)
+            return task
+
+    def touch(self, task_id: int):
+        """ У заказа есть открытые сообщения, не вытеснять его grace секунд """
+
+        with self.__lock__:
+            # Закреплять можно только заказ в кэше, иначе __pinned__ растёт без предела
+            if task_id in self.__tasks__:
+                self.__pinned__[task_id] = time.time() + self.grace
+
+    def stats(self):
+        with self.__lock__:
+            lookups = self.__counters__['hits'] + self.__counters__['misses']
+
+            return {
+                'size': len(self.__tasks__),
+                'hit_rate': round(self.__counters__['hits'] / lookups, 3) if lookups else 0.0,
+                **self.__counters__,
+            }
+
+    def __getitem__(self, task_id: int):
+        task = self.get(task_id)
+
+        if task is None:
+            raise KeyError(task_id)
+        return task
+
+    def __setitem__(self, task_id: int, task):
+        with self.__lock__:
+            self.__tasks__[task_id] = task
+            self.__tasks__.move_to_end(task_id)
+            self.__evict__()
+
+    def __delitem__(self, task_id: int):
+        with self.__lock__:
+            del self.__tasks__[task_id]
+            self.__pinned__.pop(task_id, None)
+
+    def __contains__(self, task_id):
+        return task_id in self.__tasks__
+
+    def __len__(self):
+        return len(self.__tasks__)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        with self.__lock__:
+            return list(self.__tasks__.keys())
+
+    def values(self):
+        with self.__lock__:
+            return list(self.__tasks__.values())
+
+    def items(self):
+        with self.__lock__:
+            return list(self.__tasks__.items())
+
+    def snapshot(self) -> dict:
+        """ Копия кэша, которую можно обходить без блокировок """
+
+        with self.__lock__:
+            return dict(self.__tasks__)
+
+    def __is_pinned__(self, task_id: int, now: float):
+        until = self.__pinned__.get(task_id)
+
+        if until is None:
+            return False
+
+        if until < now:
+            del self.__pinned__[task_id]
+            return False
+
+        return True
+
+    def __evict__(self):
+        now = time.time()
+
+        if now - self.__last_sweep__ >= self.__sweep_interval__:
+            self.__last_sweep__ = now
+            oldest = datetime.datetime.now() - datetime.timedelta(seconds=self.ttl)
+
+            expired = [
+                task_id for task_id, task in self.__tasks__.items()
+                if task.published_at is not None and task.published_at < oldest
+                and not self.__is_pinned__(task_id, now)
+            ]
+
+            for task_id in expired:
+                del self.__tasks__[task_id]
+
+            for task_id in [task_id for task_id, until in self.__pinned__.items() if until < now]:
+                del self.__pinned__[task_id]
+
+            self.__counters__['expired'] += len(expired)
+
+        if len(self.__tasks__) > self.max_size:
+            overflow = len(self.__tasks__) - self.max_size
+            evicted = []
+
+            # Самые давно использованные в начале OrderedDict
+            for task_id in self.__tasks__:
+                if len(evicted) == overflow:
+                    break
+
+                if not self.__is_pinned__(task_id, now):
+                    evicted.append(task_id)
+
+            for task_id in evicted:
+                del self.__tasks__[task_id]
+
+            self.__counters__['evicted'] += len(evicted)
+
+        if now - self.__last_report__ >= 60:
+            self.__last_report__ = now
+            self.log(self.stats())
+
+    def log(self, msg, name='CACHE'):
+        self.logger.info(f'[{name}]: {msg}')
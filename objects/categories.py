@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Tuple
+
+
+class Categories:
+    """ Categories | Общий реестр категорий, каждой подкатегории соответствует бит маски """
+
+    tree = {
+        'Разработка': [
+            'Сайты «под ключ»',
+            'Бэкенд',
+            'Фронтенд',
+            'Прототипирование',
+            'iOS',
+            'Android',
+            'Десктопное ПО',
+            'Боты и парсинг данных',
+            'Разработка игр',
+            '1С-программирование',
+            'Скрипты и плагины',
+            'Разное',
+        ],
+        'Тестирование': [
+            'Сайты',
+            'Мобайл',
+            'Софт',
+        ],
+        'Администрирование': [
+            'Серверы',
+            'Компьютерные сети',
+            'Базы данных',
+            'Защита ПО и безопасность',
+            'Разное',
+        ],
+        'Дизайн': [
+            'Сайты',
+            'Лендинги',
+            'Логотипы',
+            'Рисунки и иллюстрации',
+            'Мобильные приложения',
+            'Иконки',
+            'Полиграфия',
+            'Баннеры',
+            'Векторная графика',
+            'Фирменный стиль',
+            'Презентации',
+            '3D',
+            'Анимация',
+            'Обработка фото',
+            'Разное',
+        ],
+        'Контент': [
+            'Копирайтинг',
+            'Рерайтинг',
+            'Расшифровка аудио и видео',
+            'Статьи и новости',
+            'Сценарии',
+            'Нейминг и слоганы',
+            'Редактура и корректура',
+            'Переводы',
+            'Рефераты, дипломы, курсовые',
+            'Техническая документация',
+            'Контент-менеджмент',
+            'Разное',
+        ],
+        'Маркетинг': [
+            'SMM',
+            'SEO',
+            'Контекстная реклама',
+            'E-mail маркетинг',
+            'Исследования рынка и опросы',
+            'Продажи и генерация лидов',
+            'PR-менеджмент',
+            'Разное',
+        ],
+        'Разное': [
+            'Аудит и аналитика',
+            'Консалтинг',
+            'Юриспруденция',
+            'Бухгалтерские услуги',
+            'Аудио',
+            'Видео',
+            'Инженерия',
+            'Разное',
+        ],
+    }
+
+    bits: Dict[Tuple[str, str], int] = {}
+    masks: Dict[str, int] = {}
+
+    @staticmethod
+    def bit(category_name: str, sub_category_name: str) -> int:
+        """ Бит подкатегории, 0 для неизвестной """
+        return Categories.bits.get((category_name, sub_category_name), 0)
+
+    @staticmethod
+    def from_dict(categories: dict) -> int:
+        """ {категория: {подкатегория: bool}} -> маска """
+
+        mask = 0
+
+        for category_name, sub_categories in categories.items():
+            for sub_category_name, status in sub_categories.items():
+                if status:
+                    mask |= Categories.bit(category_name, sub_category_name)
+
+        return mask
+
+    @staticmethod
+    def selected(mask: int) -> dict:
+        """ Маска -> {категория: {подкатегория: True}} только для выбранных подкатегорий """
+
+        selected = {}
+
+        for (category_name, sub_category_name), bit in Categories.bits.items():
+            if mask & bit:
+                selected.setdefault(category_name, {})[sub_category_name] = True
+
+        return selected
+
+    @staticmethod
+    def to_dict(mask: int) -> dict:
+        """ Маска -> {категория: {подкатегория: bool}} """
+
+        return {
+            category_name: {
+                sub_category_name: bool(mask & Categories.bits[(category_name, sub_category_name)])
+                for sub_category_name in sub_categories
+            }
+            for category_name, sub_categories in Categories.tree.items()
+        }
+
+
+def __register__():
+    for category_name, sub_categories in Categories.tree.items():
+        Categories.masks[category_name] = 0
+
+        for sub_category_name in sub_categories:
+            Categories.bits[(category_name, sub_category_name)] = 1 << len(Categories.bits)
+            Categories.masks[category_name] |= Categories.bits[(category_name, sub_category_name)]
+
+
+__register__()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import List
+
+import requests
+
+
+class CurrencyRate:
+    url = 'https://api.exchangeratesapi.io/latest'
+
+    def __init__(self, root_path: str, fallback: float = 75.0, ttl: float = 6 * 3600,
+                 retry_interval: float = 300, timeout: float = 5, prices_limit: int = 4096):
+        """ CurrencyRate | Курс доллара в рублях для цен заказов
+
+        При запуске курс берётся из data/currency.json, а если его нет, из fallback,
+        и обновляется в фоне раз в ttl секунд. Запуск не ждёт сети.
+        """
+
+        self.__path__ = os.path.join(root_path, 'data', 'currency.json')
+
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+
+        self.rate = fallback
+        self.updated_at = 0
+
+        # Строка цены -> (RUB, USD, value_usd) по курсу __prices_rate__
+        self.__prices__ = {}
+        self.__prices_rate__ = None
+        self.__prices_limit__ = prices_limit
+
+        self.__thread__ = None
+        self.__kill__ = threading.Event()
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+        self.__load__()
+
+    def convert(self, rubles: int, beauty=False):
+        """ Рубли в доллары по текущему курсу, '1 234$' при beauty """
+
+        return self.__convert__(rubles, self.rate, beauty)
+
+    def normalize_prices(self, prices: List[dict]):
+        """ Дополнить цены страницы заказов полями RUB, USD и value_usd
+
+        Цены, которые уже встречались на прошлых опросах, берутся из кэша целиком,
+        разбирается и пересчитывается только новое.
+        """
+
+        rate = self.rate
+
+        if rate != self.__prices_rate__ or len(self.__prices__) > self.__prices_limit__:
+            self.__prices__, self.__prices_rate__ = {}, rate
+
+        cache = self.__prices__
+
+        for price in prices:
+            normalized = cache.get(price['value'])
+
+            if normalized is None:
+                rubles = int(''.join(price['value'].split()[:-1]))
+                normalized = cache[price['value']] = (
+                    rubles, self.__convert__(rubles, rate, False), self.__convert__(rubles, rate, True)
+                )
+
+            price['RUB'], price['USD'], price['value_usd'] = normalized
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def __convert__(rubles: int, rate: float, beauty: bool):
+        # Цены заказов повторяются, а курс меняется редко
+        if beauty:
+            return '{:,}$'.format(round(rubles / rate)).replace(',', ' ')
+        return rubles / rate
+
+    def run(self):
+        thr = threading.Thread(target=self.__refresh_loop__, daemon=True)
+        thr.start()
+        self.__thread__ = thr
+
+    def stop(self):
+        self.__kill__.set()
+
+    def refresh(self) -> bool:
+        """ Запросить курс, при успехе сохранить его на диск """
+
+        try:
+            response = requests.get(self.url, params={'base': 'USD'}, timeout=self.timeout)
+            rate = float(response.json()['rates']['RUB'])
+
+        except (requests.RequestException, ValueError, KeyError, TypeError) as error:
+            self.log(f'Failed to update dollar rate: {error!r}')
+            return False
+
+        self.rate, self.updated_at = rate, time.time()
+        self.__save__()
+
+        self.log(f'Dollar rate {rate}')
+        return True
+
+    def __refresh_loop__(self):
+        while not self.__kill__.is_set():
+            stale = time.time() - self.updated_at >= self.ttl
+
+            if stale and not self.refresh():
+                delay = self.retry_interval
+            else:
+                delay = self.updated_at + self.ttl - time.time()
+
+            self.__kill__.wait(max(delay, 1))
+
+    def __load__(self):
+        if not os.access(self.__path__, os.F_OK):
+            self.log(f'No saved dollar rate, using {self.rate}')
+            return
+
+        with open(self.__path__, encoding='utf-8') as file:
+            try:
+                data = json.load(file)
+                self.rate, self.updated_at = float(data['rate']), float(data['updated_at'])
+
+            except (json.decoder.JSONDecodeError, KeyError, TypeError, ValueError):
+                self.log(f'Error loading dollar rate, using {self.rate}')
+
+    def __save__(self):
+        os.makedirs(os.path.dirname(self.__path__), exist_ok=True)
+
+        with open(f'{self.__path__}.tmp', encoding='utf-8', mode='w') as file:
+            json.dump({'rate': self.rate, 'updated_at': self.updated_at}, file)
+
+        os.replace(f'{self.__path__}.tmp', self.__path__)
+
+    def log(self, msg, name='CURRENCY'):
+        self.logger.info(f'[{name}]: {msg}')
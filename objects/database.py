@@ -1,78 +1,239 @@
 # -*- coding: utf-8 -*-
 
+import functools
 import json
 import logging
 import os
 import threading
 import time
-from typing import Dict
+import traceback
+from typing import Set
 
+from objects.cache import TaskCache
+from objects.recent import RecentTasks
+from objects.state import SharedDict
+from objects.storage import storages
+from objects.subscriptions import Subscriptions
 from objects.task import Task
 from objects.user import User
 
 
 class Database:
-    def __init__(self, users: Dict[int, User], tasks: Dict[int, Task], root_path: str):
+    def __init__(self, users: SharedDict, tasks: TaskCache, root_path: str,
+                 subscriptions: Subscriptions = None, storage: str = 'json', lazy_users: bool = False,
+                 serializer: str = 'json'):
         self.__routing_path__ = {
             'root': os.path.join(root_path, 'data'),
-            'users': os.path.join(root_path, 'data', 'users.json'),
-            'tasks': os.path.join(root_path, 'data', 'tasks.json')
+            'bootstrap': os.path.join(root_path, 'data', 'bootstrap.json'),
         }
 
+        self.__storage__ = storages[storage](root_path, serializer=serializer)
+
         self.__last_save__ = time.time()
         self.__auto_save_thread__ = None
+        self.__save_lock__ = threading.Lock()
         self.__users__ = users
         self.__tasks__ = tasks
+        self.__subscriptions__ = subscriptions
+        self.recent = RecentTasks()
+
+        # Без индексированного хранилища пользователя не найти по id, и индекс подписок неполон
+        self.__lazy_users__ = lazy_users and self.__storage__.indexed
 
-        self.kill_flag = False
+        # Изменённые с последнего сохранения записи
+        self.__dirty__ = {'users': {}, 'tasks': {}}
+        self.__dirty_lock__ = threading.Lock()
+        self.__changed__ = threading.Event()
+        self.__kill__ = threading.Event()
 
         self.logger = logging.getLogger('freelansim_bot')
 
-        self.__folders_init__()
+        if lazy_users and not self.__lazy_users__:
+            self.log(f'Lazy users are not supported by {storage} storage, loading all users')
+
+    def add_user(self, user: User):
+        self.__users__[user.id] = user
+        user.set_on_change(functools.partial(self.mark_dirty, 'users'))
+        self.mark_dirty('users', user)
+
+    def add_task(self, task: Task):
+        self.__tasks__[task.id] = task
+        task.set_on_change(functools.partial(self.mark_dirty, 'tasks'))
+        self.recent.push(task)
+        self.mark_dirty('tasks', task)
 
-    def __folders_init__(self):
-        if not os.access(self.__routing_path__['root'], os.F_OK):
-            os.mkdir(self.__routing_path__['root'])
+    def mark_dirty(self, name: str, record):
+        with self.__dirty_lock__:
+            # Храним сам объект: заказ может быть вытеснен из кэша до сохранения
+            self.__dirty__[name][record.id] = record
 
-        if not os.access(self.__routing_path__['users'], os.F_OK):
-            with open(self.__routing_path__['users'], 'w') as file:
-                json.dump({}, file)
+        if name == 'tasks':
+            self.recent.invalidate(record.id)
 
-        if not os.access(self.__routing_path__['tasks'], os.F_OK):
-            with open(self.__routing_path__['tasks'], 'w') as file:
-                json.dump({}, file)
+        self.__changed__.set()
+
+    @property
+    def __collections__(self):
+        return {
+            'users': (self.__users__, lambda data: User(data, self.__subscriptions__)),
+            'tasks': (self.__tasks__, Task),
+        }
 
     def save_data(self):
-        self.log('Saving data...')
+        """ Сохранить изменённые записи, при необходимости сжать хранилище """
 
-        with open(self.__routing_path__['users'], encoding='utf-8', mode='w') as file:
-            json.dump(self.to_json(self.__users__), file, ensure_ascii=False, indent=2)
+        with self.__save_lock__:
+            self.__changed__.clear()
 
-        # with open(self.__routing_path__['tasks'], mode='w') as file:
-        #     json.dump(self.to_json(self.__tasks__), file, ensure_ascii=False, indent=2)
+            for name, (records, _) in self.__collections__.items():
+                self.__write__(name)
 
-        self.__last_save__ = time.time()
+                if self.__storage__.need_compact(name, len(records)):
+                    self.__storage__.compact(
+                        name, ((key, value.json()) for key, value in records.snapshot().items())
+                    )
+
+            self.__last_save__ = time.time()
+
+    def __write__(self, name: str):
+        """ Дописать в хранилище изменённые записи коллекции, без сжатия """
+
+        with self.__dirty_lock__:
+            dirty, self.__dirty__[name] = self.__dirty__[name], {}
+
+        changed = {key: record.json() for key, record in dirty.items()}
+
+        try:
+            self.__storage__.write(name, changed)
+
+        except Exception:
+            # Вернуть записи в грязные, не затирая изменённые за время записи
+            with self.__dirty_lock__:
+                self.__dirty__[name] = {**dirty, **self.__dirty__[name]}
+
+            self.__changed__.set()
+            raise
+
+        if changed:
+            self.log(f'Saved {len(changed)} {name}')
+
+    @property
+    def has_changes(self):
+        return self.__changed__.is_set()
+
+    def flush(self, *names: str):
+        """ Записать изменённые записи коллекций names перед запросом к индексированному хранилищу
+
+        Только запись грязных записей, без сжатия: вызывается из обработчиков и рассылки.
+        """
+
+        with self.__save_lock__:
+            for name in names:
+                if self.__dirty__[name]:
+                    self.__write__(name)
 
     def load_data(self):
-        with open(self.__routing_path__['users'], encoding='utf-8') as file:
-            try:
-                data = json.load(file)
-                for key in data:
-                    self.__users__[int(key)] = User(data[key])
-                self.log(f'Load {len(data)} users')
+        for name, (records, factory) in self.__collections__.items():
+            if name == 'users' and self.__lazy_users__:
+                self.log('Users will be loaded on first access')
+                continue
 
-            except json.decoder.JSONDecodeError:
-                self.log('Error loading users !')
+            count = 0
+
+            # Записи приходят из хранилища по одной, без промежуточного словаря
+            for key, value in self.__storage__.load(name):
+                record = records[key] = self.__bind__(name, factory(value))
+
+                if name == 'tasks':
+                    self.recent.push(record)
+
+                count += 1
+
+            self.log(f'Load {count} {name}')
+
+    def __bind__(self, name: str, record):
+        record.set_on_change(functools.partial(self.mark_dirty, name))
+        return record
+
+    def get_user(self, user_id: int):
+        """ Пользователь из памяти, а при ленивой загрузке из хранилища """
+
+        user = self.__users__.get(user_id)
 
-        with open(self.__routing_path__['tasks'], encoding='utf-8') as file:
+        if user is None and self.__lazy_users__:
+            data = self.__storage__.get('users', user_id)
+
+            if data is not None:
+                user, _ = self.__users__.get_or_create(
+                    user_id, lambda: self.__bind__('users', User(data, self.__subscriptions__))
+                )
+
+        return user
+
+    def get_task(self, task_id: int):
+        """ Заказ из памяти, а если его там нет, из хранилища """
+
+        task = self.__tasks__.get(task_id)
+
+        if task is None and self.__storage__.indexed:
+            data = self.__storage__.get('tasks', task_id)
+
+            if data is not None:
+                task = self.__tasks__[task_id] = self.__bind__('tasks', Task(data))
+
+        return task
+
+    def subscribers(self, category_name: str, sub_category_name: str) -> Set[int]:
+        """ id пользователей с уведомлениями, подписанных на подкатегорию """
+
+        # Индекс в памяти полон, пока пользователи загружены целиком
+        if not self.__lazy_users__:
+            return self.__subscriptions__.get(category_name, sub_category_name)
+
+        self.flush('users')
+
+        return self.__storage__.subscribers(category_name, sub_category_name)
+
+    def stats(self):
+        """ (заказов, пользователей, подписок на уведомления) """
+
+        if not self.__storage__.indexed:
+            users = self.__users__.snapshot().values()
+            return len(self.__tasks__), len(users), len([user for user in users if user.has_notifications])
+
+        self.flush('tasks', 'users')
+
+        return (
+            self.__storage__.count('tasks'),
+            self.__storage__.count('users'),
+            self.__storage__.count_notifications(),
+        )
+
+    def load_checkpoint(self):
+        """ Checkpoint незавершённой начальной загрузки заказов """
+
+        if not os.access(self.__routing_path__['bootstrap'], os.F_OK):
+            return None
+
+        with open(self.__routing_path__['bootstrap'], encoding='utf-8') as file:
             try:
-                data = json.load(file)
-                for key in data:
-                    self.__tasks__[int(key)] = Task(data[key])
-                self.log(f'Load {len(data)} tasks')
+                return json.load(file)
 
             except json.decoder.JSONDecodeError:
-                self.log('Error loading tasks !')
+                self.log('Error loading bootstrap checkpoint !')
+                return None
+
+    def save_checkpoint(self, checkpoint: dict):
+        path = self.__routing_path__['bootstrap']
+
+        with open(f'{path}.tmp', encoding='utf-8', mode='w') as file:
+            json.dump(checkpoint, file, ensure_ascii=False)
+
+        os.replace(f'{path}.tmp', path)
+
+    def clear_checkpoint(self):
+        if os.access(self.__routing_path__['bootstrap'], os.F_OK):
+            os.remove(self.__routing_path__['bootstrap'])
 
     def run_auto_save(self, interval: int or float = 60):
         thr = threading.Thread(target=self.__auto_save__, args=[interval], daemon=True)
@@ -80,26 +241,27 @@ class Database:
         self.__auto_save_thread__ = thr
 
     def __auto_save__(self, interval: int):
-        while True:
-            if self.kill_flag:
-                self.log('Saving before exiting')
-                break
-            now = time.time()
-            if (now - self.__last_save__) >= interval:
-                self.save_data()
-            time.sleep(0.1)
+        while not self.__kill__.is_set():
+            # Спим, пока ничего не изменилось
+            self.__changed__.wait()
 
-    @staticmethod
-    def to_json(data: dict):
-        response = {}
+            # Копим изменения не дольше interval с прошлого сохранения
+            if self.__kill__.wait(max(0.0, interval - (time.time() - self.__last_save__))):
+                break
 
-        for key in data.keys():
-            response[str(key)] = data[key].json()
+            try:
+                self.save_data()
 
-        return response
+            except Exception:
+                print(traceback.format_exc())
+                self.__last_save__ = time.time()
 
     def exit(self):
-        self.kill_flag = True
+        self.__kill__.set()
+        self.__changed__.set()
+        self.log('Saving before exiting')
+        self.save_data()
+        self.__storage__.close()
 
     def log(self, msg, name='DATABASE'):
         self.logger.info(f'[{name}]: {msg}')
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import threading
+import time
+from typing import Callable
+
+
+class ReplyDebouncer:
+    def __init__(self, send: Callable, delay: float = 1.5, max_delay: float = 5):
+        """ ReplyDebouncer | Один ответ на серию быстрых нажатий ●/○
+
+        Строки ответов копятся по чату и уходят одним сообщением через delay
+        секунд после последнего нажатия (но не позже max_delay от первого)
+        вместе с клавиатурой последнего нажатия.
+
+        :param send: send(chat_id, text=..., **kwargs), например Bot.send_message
+        """
+
+        self.delay = delay
+        self.max_delay = max_delay
+
+        self.__send__ = send
+        self.__pending__ = {}
+        self.__lock__ = threading.Lock()
+
+    def add(self, chat_id: int, key, text: str, **kwargs):
+        """ Добавить строку ответа, повторное нажатие на тот же key заменяет прошлую строку """
+
+        if self.delay <= 0:
+            return self.__send__(chat_id, text=text, **kwargs)
+
+        now = time.monotonic()
+
+        with self.__lock__:
+            pending = self.__pending__.get(chat_id)
+
+            if pending is None:
+                pending = self.__pending__[chat_id] = {
+                    'lines': collections.OrderedDict(),
+                    'started': now,
+                    'timer': None,
+                }
+
+            else:
+                pending['timer'].cancel()
+
+            pending['lines'].pop(key, None)
+            pending['lines'][key] = text
+            pending['kwargs'] = kwargs
+
+            delay = max(0.0, min(self.delay, pending['started'] + self.max_delay - now))
+
+            pending['timer'] = threading.Timer(delay, self.flush, (chat_id,))
+            pending['timer'].daemon = True
+            pending['timer'].start()
+
+    def flush(self, chat_id: int):
+        """ Отправить накопленный ответ чату сейчас """
+
+        with self.__lock__:
+            pending = self.__pending__.pop(chat_id, None)
+
+            if pending is None:
+                return None
+
+            pending['timer'].cancel()
+
+        return self.__send__(chat_id, text='\n'.join(pending['lines'].values()), **pending['kwargs'])
+
+    def flush_all(self):
+        for chat_id in list(self.__pending__):
+            self.flush(chat_id)
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import itertools
+import logging
+import queue
+import threading
+import time
+import traceback
+from typing import Callable, Dict
+
+import telegram.error
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """ Token bucket | rate токенов в секунду, не больше capacity подряд """
+
+        self.rate = rate
+        self.capacity = capacity
+
+        self.__tokens__ = capacity
+        self.__updated__ = time.monotonic()
+        self.__lock__ = threading.Lock()
+
+    def reserve(self) -> float:
+        """ Забрать токен
+        :return: сколько секунд нужно подождать до отправки
+        """
+
+        with self.__lock__:
+            now = time.monotonic()
+            self.__tokens__ = min(self.capacity, self.__tokens__ + (now - self.__updated__) * self.rate)
+            self.__updated__ = now
+            self.__tokens__ -= 1
+
+            if self.__tokens__ >= 0:
+                return 0.0
+            return -self.__tokens__ / self.rate
+
+    @property
+    def idle(self):
+        with self.__lock__:
+            return self.__tokens__ + (time.monotonic() - self.__updated__) * self.rate >= self.capacity
+
+
+class Job:
+    def __init__(self, chat_id: int, method: str, kwargs: dict, key=None, callback: Callable = None,
+                 replace=False):
+        self.chat_id = chat_id
+        self.method = method
+        self.kwargs = kwargs
+        self.key = key
+        self.callback = callback
+        self.replace = replace
+
+        self.created = time.monotonic()
+        self.attempts = 0
+
+    def __repr__(self):
+        return '<Job %s | %s | %s >' % (self.chat_id, self.method, self.key)
+
+
+class Delivery:
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+    def __init__(self, bot, workers: int = 4, global_rate: float = 30, chat_rate: float = 1,
+                 max_attempts: int = 5, on_blocked: Callable = None):
+        """ Delivery | Пул воркеров для отправки сообщений в Telegram с учётом лимитов """
+
+        self.__bot__ = bot
+        self.__workers_count__ = workers
+        self.__max_attempts__ = max_attempts
+        self.__on_blocked__ = on_blocked
+
+        self.__queue__ = queue.PriorityQueue()
+        self.__counter__ = itertools.count()
+        self.__workers__ = []
+
+        self.__global_bucket__ = TokenBucket(global_rate, global_rate)
+        self.__chat_rate__ = chat_rate
+        self.__chat_buckets__: Dict[int, TokenBucket] = {}
+        self.__paused_until__ = 0.0
+
+        # (chat_id, key) -> Job в очереди
+        self.__pending__ = {}
+        self.__delivered__ = collections.OrderedDict()
+        self.__lock__ = threading.Lock()
+
+        self.__latencies__ = collections.deque(maxlen=1000)
+        self.__counters__ = collections.Counter()
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+    def run(self):
+        for _ in range(self.__workers_count__):
+            thr = threading.Thread(target=self.__worker__, daemon=True)
+            thr.start()
+            self.__workers__.append(thr)
+
+    def submit(self, chat_id: int, method: str = 'send_message', priority: int = NORMAL,
+               key=None, callback: Callable = None, replace=False, **kwargs):
+        """ Поставить отправку в очередь
+        :param key: одинаковые key для одного чата отправляются один раз
+        :param callback: вызывается с результатом успешной отправки
+        :param replace: с key: новая отправка заменяет ждущую в очереди, а не отбрасывается,
+            и может повторяться после доставки (например, правки одного сообщения)
+        :return: False, если отправка схлопнута с уже существующей
+        """
+
+        job = Job(chat_id, method, kwargs, key, callback, replace)
+
+        if key is not None:
+            with self.__lock__:
+                queued = self.__pending__.get((chat_id, key))
+
+                if queued is not None and replace:
+                    queued.method, queued.kwargs, queued.callback = method, kwargs, callback
+                    self.__counters__['replaced'] += 1
+                    return False
+
+                if queued is not None or (chat_id, key) in self.__delivered__:
+                    self.__counters__['collapsed'] += 1
+                    return False
+
+                self.__pending__[(chat_id, key)] = job
+
+        self.__put__(priority, job)
+        return True
+
+    def stats(self):
+        """ Глубина очереди, задержка доставки и счётчики """
+
+        latencies = sorted(self.__latencies__)
+
+        return {
+            'queue': self.__queue__.qsize(),
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            **self.__counters__,
+        }
+
+    def stop(self):
+        for _ in self.__workers__:
+            self.__queue__.put((float('inf'), next(self.__counter__), None))
+
+    def __put__(self, priority: int, job: Job):
+        self.__queue__.put((priority, next(self.__counter__), job))
+
+    def __chat_bucket__(self, chat_id: int):
+        with self.__lock__:
+            bucket = self.__chat_buckets__.get(chat_id)
+
+            if bucket is None:
+                if len(self.__chat_buckets__) > 10000:
+                    self.__chat_buckets__ = {
+                        key: value for key, value in self.__chat_buckets__.items() if not value.idle
+                    }
+                bucket = self.__chat_buckets__[chat_id] = TokenBucket(self.__chat_rate__, 1)
+
+            return bucket
+
+    def __worker__(self):
+        while True:
+            priority, _, job = self.__queue__.get()
+
+            if job is None:
+                break
+
+            pause = self.__paused_until__ - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+
+            time.sleep(max(self.__chat_bucket__(job.chat_id).reserve(), self.__global_bucket__.reserve()))
+
+            try:
+                self.__deliver__(priority, job)
+
+            except Exception:
+                # Любая другая ошибка отправки или callback не должна останавливать воркер
+                self.__counters__['error'] += 1
+                print(traceback.format_exc())
+                self.__done__(job)
+
+    def __take__(self, job: Job):
+        """ Взять отправку из очереди: заменяемая больше не принимает замен,
+        новая отправка с тем же key встанет в очередь после неё
+        :return: (method, kwargs) для отправки
+        """
+
+        with self.__lock__:
+            if job.replace and self.__pending__.get((job.chat_id, job.key)) is job:
+                del self.__pending__[(job.chat_id, job.key)]
+
+            return job.method, job.kwargs
+
+    def __deliver__(self, priority: int, job: Job):
+        job.attempts += 1
+        method, kwargs = self.__take__(job)
+
+        try:
+            # chat_id именованным: у edit_message_text первый аргумент text
+            result = getattr(self.__bot__, method)(chat_id=job.chat_id, **kwargs)
+
+        except telegram.error.RetryAfter as error:
+            self.__counters__['retry_after'] += 1
+            self.__paused_until__ = max(self.__paused_until__, time.monotonic() + error.retry_after)
+            self.log(f'Flood limit, retry after {error.retry_after}s')
+            return self.__retry__(priority, job)
+
+        except telegram.error.Unauthorized as error:
+            self.__counters__['unauthorized'] += 1
+            self.log(error)
+
+            if 'bot was blocked by the user' in str(error) and self.__on_blocked__ is not None:
+                self.__on_blocked__(job.chat_id)
+
+            return self.__done__(job)
+
+        except telegram.error.BadRequest as error:
+            self.__counters__['bad_request'] += 1
+            self.log(error)
+            return self.__done__(job)
+
+        except telegram.error.NetworkError as error:
+            self.__counters__['network_error'] += 1
+            self.log(error)
+            time.sleep(min(2 ** job.attempts, 30))
+            return self.__retry__(priority, job)
+
+        self.__counters__['sent'] += 1
+        self.__latencies__.append(time.monotonic() - job.created)
+        self.__done__(job, delivered=True)
+
+        if job.callback is not None:
+            job.callback(result)
+
+    def __retry__(self, priority: int, job: Job):
+        if job.attempts >= self.__max_attempts__:
+            self.__counters__['dropped'] += 1
+            self.log(f'Dropped {job} after {job.attempts} attempts')
+            return self.__done__(job)
+
+        if job.replace:
+            with self.__lock__:
+                # Уже есть более новая отправка с тем же key, старую не повторяем
+                if (job.chat_id, job.key) in self.__pending__:
+                    self.__counters__['replaced'] += 1
+                    return
+
+                self.__pending__[(job.chat_id, job.key)] = job
+
+        self.__counters__['retried'] += 1
+        self.__put__(priority, job)
+
+    def __done__(self, job: Job, delivered=False):
+        if job.key is None:
+            return
+
+        with self.__lock__:
+            if self.__pending__.get((job.chat_id, job.key)) is job:
+                del self.__pending__[(job.chat_id, job.key)]
+
+            if delivered and not job.replace:
+                self.__delivered__[(job.chat_id, job.key)] = True
+                if len(self.__delivered__) > 100000:
+                    self.__delivered__.popitem(last=False)
+
+    def log(self, msg, name='DELIVERY'):
+        self.logger.info(f'[{name}]: {msg}')
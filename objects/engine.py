@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import logging
+import time
+import traceback
+
+import telegram
+
+from objects.delivery import Delivery, Job
+from objects.static import Static
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncDelivery(Delivery):
+    def __init__(self, bot, session, token: str, **kwargs):
+        """ AsyncDelivery | Delivery поверх Bot API через aiohttp на одном event loop """
+
+        super().__init__(bot, **kwargs)
+
+        self.__session__ = session
+        self.__api__ = f'https://api.telegram.org/bot{token}'
+        self.__loop__ = None
+
+    def run(self):
+        self.__loop__ = asyncio.get_running_loop()
+        self.__queue__ = asyncio.PriorityQueue()
+
+        for _ in range(self.__workers_count__):
+            self.__workers__.append(self.__loop__.create_task(self.__worker__()))
+
+    def stop(self):
+        if self.__loop__ is None or self.__loop__.is_closed():
+            return
+
+        for worker in self.__workers__:
+            self.__loop__.call_soon_threadsafe(worker.cancel)
+
+    def __put__(self, priority: int, job: Job):
+        # submit может вызываться и из потоков обработчиков Telegram
+        self.__loop__.call_soon_threadsafe(self.__queue__.put_nowait, (priority, next(self.__counter__), job))
+
+    async def __worker__(self):
+        while True:
+            priority, _, job = await self.__queue__.get()
+
+            pause = self.__paused_until__ - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+            await asyncio.sleep(max(self.__chat_bucket__(job.chat_id).reserve(), self.__global_bucket__.reserve()))
+
+            try:
+                await self.__deliver__(priority, job)
+
+            except Exception:
+                self.__counters__['error'] += 1
+                print(traceback.format_exc())
+                self.__done__(job)
+
+    async def __deliver__(self, priority: int, job: Job):
+        job.attempts += 1
+        method, kwargs = self.__take__(job)
+
+        name, *parts = method.split('_')
+        method = name + ''.join(part.capitalize() for part in parts)
+
+        try:
+            async with self.__session__.post(
+                f'{self.__api__}/{method}', data=self.__payload__(job.chat_id, kwargs)
+            ) as response:
+                result = await response.json()
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            self.__counters__['network_error'] += 1
+            self.log(error)
+            await asyncio.sleep(min(2 ** job.attempts, 30))
+            return self.__retry__(priority, job)
+
+        if not result.get('ok'):
+            error_code, description = result.get('error_code'), result.get('description', '')
+
+            if error_code == 429:
+                retry_after = result.get('parameters', {}).get('retry_after', 1)
+                self.__counters__['retry_after'] += 1
+                self.__paused_until__ = max(self.__paused_until__, time.monotonic() + retry_after)
+                self.log(f'Flood limit, retry after {retry_after}s')
+                return self.__retry__(priority, job)
+
+            if error_code == 403:
+                self.__counters__['unauthorized'] += 1
+                self.log(description)
+
+                if 'bot was blocked by the user' in description and self.__on_blocked__ is not None:
+                    self.__on_blocked__(job.chat_id)
+
+                return self.__done__(job)
+
+            self.__counters__['bad_request'] += 1
+            self.log(description)
+            return self.__done__(job)
+
+        self.__counters__['sent'] += 1
+        self.__latencies__.append(time.monotonic() - job.created)
+        self.__done__(job, delivered=True)
+
+        if job.callback is not None:
+            message = result['result']
+            job.callback(telegram.Message.de_json(message, self.__bot__) if isinstance(message, dict) else message)
+
+    @staticmethod
+    def __payload__(chat_id: int, kwargs: dict):
+        payload = {'chat_id': str(chat_id)}
+
+        for key, value in kwargs.items():
+            if value is None:
+                continue
+
+            if isinstance(value, bool):
+                value = 'true' if value else 'false'
+            elif isinstance(value, telegram.ReplyMarkup):
+                value = value.to_json()
+            elif isinstance(value, (dict, list)):
+                value = json.dumps(value, ensure_ascii=False)
+
+            payload[key] = str(value)
+
+        return payload
+
+
+class AsyncEngine:
+    def __init__(self, bot, token: str, save_interval: float = 60):
+        """ AsyncEngine | Опрос freelansim.ru, рассылка и сохранение на одном asyncio event loop
+
+        Входящие сообщения по-прежнему обрабатывает telegram.ext.Updater.
+        """
+
+        if aiohttp is None:
+            raise RuntimeError('aiohttp is required for the async engine')
+
+        self.__bot__ = bot
+        self.__token__ = token
+        self.__save_interval__ = save_interval
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+    def run(self):
+        try:
+            asyncio.run(self.__main__())
+
+        except KeyboardInterrupt:
+            self.__bot__.__exit__()
+
+    async def __main__(self):
+        bot = self.__bot__
+
+        async with aiohttp.ClientSession(headers=dict(bot.__session__.headers)) as session:
+            bot.__delivery__ = AsyncDelivery(bot.__tg_bot__, session, self.__token__, on_blocked=bot.__on_blocked__)
+            bot.__delivery__.run()
+
+            bot.init_tasks(pages=1, background=True)
+
+            await asyncio.gather(self.__poll__(session), self.__auto_save__())
+
+    async def __request_tasks__(self, session, page=1, version=None, conditional=False):
+        bot = self.__bot__
+
+        async with session.get(
+            Static.urls['tasks'],
+            headers=bot.__tasks_headers__(page, version, conditional),
+            params={
+                'per_page': 50,
+                'page': page
+            },
+            timeout=aiohttp.ClientTimeout(total=2),
+        ) as response:
+            content = await response.read()
+            return bot.__tasks_response__(page, version, response.status, response.headers, content)
+
+    async def __poll__(self, session):
+        self.log('Start main pool...')
+
+        bot = self.__bot__
+        poller = bot.__poller__
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await asyncio.sleep(poller.delay())
+
+            full = poller.is_full
+
+            try:
+                (addition, addition_modified), (data, modified) = await asyncio.gather(
+                    self.__request_tasks__(session, 1, None, not full),
+                    self.__request_tasks__(session, 1, '1', not full),
+                )
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                poller.failure()
+                self.log(f'Error updating server: {error!r}')
+                continue
+
+            except Exception:
+                # Например, HTML страница ошибки вместо JSON: как long_polling, пишем и продолжаем
+                poller.failure()
+                print(traceback.format_exc())
+                self.log('Restart system...')
+                continue
+
+            try:
+                # Разбор, обновление заказов и рассылка могут ходить в хранилище: не на event loop
+                new_count = await loop.run_in_executor(
+                    None, self.__process__, addition, data, modified or addition_modified, full
+                )
+                poller.success(new_count)
+
+            except Exception:
+                print(traceback.format_exc())
+                self.log('Restart system...')
+
+    def __process__(self, addition, data, modified: bool, full: bool) -> int:
+        bot = self.__bot__
+        return bot.process_tasks(bot.parse_tasks(addition, data) if modified else None, full)
+
+    async def __auto_save__(self):
+        loop = asyncio.get_running_loop()
+        database = self.__bot__.__db__
+
+        while True:
+            await asyncio.sleep(self.__save_interval__)
+
+            if not database.has_changes:
+                continue
+
+            try:
+                await loop.run_in_executor(None, database.save_data)
+
+            except Exception:
+                # Несохранённые записи остаются грязными и уйдут при следующем сохранении
+                print(traceback.format_exc())
+
+    def log(self, msg, name='ENGINE'):
+        self.logger.info(f'[{name}]: {msg}')
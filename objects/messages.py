@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import threading
+import time
+import traceback
+from typing import Callable
+
+from objects.delivery import Delivery
+from objects.static import Static
+
+
+class TaskMessages:
+    # Поля, которые видны в уже отправленных сообщениях о заказе
+    watched = ('reply_count', 'price', 'task_comments_count')
+
+    def __init__(self, get_task: Callable, submit: Callable, delay: float = 30, ttl: float = 24 * 3600,
+                 sweep_interval: float = 3600):
+        """ TaskMessages | Отправленные сообщения о заказах и их обновление
+
+        Когда у заказа меняются watched поля, его сообщения перерисовываются
+        не чаще раза в delay секунд и правятся через submit (Delivery.submit)
+        с низким приоритетом. Сообщения старше ttl больше не обновляются.
+
+        :param get_task: get_task(task_id) -> Task или None
+        """
+
+        self.delay = delay
+        self.ttl = ttl
+
+        self.__get_task__ = get_task
+        self.__submit__ = submit
+        self.__sweep_interval__ = sweep_interval
+
+        # task_id -> {(chat_id, message_id): [full, event, хэш текста, время отправки]}
+        self.__messages__ = {}
+        self.__pending__ = set()
+        self.__lock__ = threading.Lock()
+
+        self.__wakeup__ = threading.Event()
+        self.__kill__ = threading.Event()
+        self.__thread__ = None
+
+        self.__counters__ = collections.Counter()
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+    def track(self, task_id: int, chat_id: int, message_id: int, text: str, full=False, event=False):
+        """ Запомнить сообщение с текстом text, отрисованным format_message(full, event) """
+
+        with self.__lock__:
+            self.__messages__.setdefault(task_id, {})[chat_id, message_id] = [full, event, hash(text), time.time()]
+
+    def sent(self, task_id: int, text: str, full=False, event=False) -> Callable:
+        """ callback для Delivery.submit, запоминающий отправленное сообщение """
+
+        def callback(message):
+            self.track(task_id, message.chat_id, message.message_id, text, full=full, event=event)
+
+        return callback
+
+    def forget(self, task_id: int, chat_id: int, message_id: int):
+        with self.__lock__:
+            messages = self.__messages__.get(task_id)
+
+            if messages is not None:
+                messages.pop((chat_id, message_id), None)
+
+                if not messages:
+                    del self.__messages__[task_id]
+
+    def changed(self, task_id: int, diff: dict):
+        """ Заказ изменился, diff из Task.update """
+
+        if task_id not in self.__messages__ or not any(key in diff for key in self.watched):
+            return
+
+        with self.__lock__:
+            self.__pending__.add(task_id)
+
+        self.__wakeup__.set()
+
+    def run(self):
+        thr = threading.Thread(target=self.__loop__, daemon=True)
+        thr.start()
+        self.__thread__ = thr
+
+    def stop(self):
+        self.__kill__.set()
+        self.__wakeup__.set()
+
+    def flush(self):
+        """ Поставить в очередь правки сообщений изменившихся заказов """
+
+        with self.__lock__:
+            pending, self.__pending__ = self.__pending__, set()
+
+        for task_id in pending:
+            task = self.__get_task__(task_id)
+
+            with self.__lock__:
+                messages = list(self.__messages__.get(task_id, {}).items())
+
+            if task is None:
+                continue
+
+            for (chat_id, message_id), state in messages:
+                full, event, text_hash, _ = state
+                text = task.format_message(full=full, event=event)
+
+                # Сообщения, в которых изменившиеся поля не видны, не трогаем
+                if hash(text) == text_hash:
+                    self.__counters__['unchanged'] += 1
+                    continue
+
+                state[2] = hash(text)
+                self.__counters__['edits'] += 1
+
+                # Правка, ещё не ушедшая из очереди, заменяется новой, а не копится рядом
+                self.__submit__(
+                    chat_id,
+                    method='edit_message_text',
+                    priority=Delivery.LOW,
+                    key=f'edit:{message_id}',
+                    replace=True,
+                    message_id=message_id,
+                    text=text,
+                    parse_mode='Markdown',
+                    disable_web_page_preview=True,
+                    reply_markup=Static.task_keyboard(task_id, full=full),
+                )
+
+        if pending:
+            self.log(dict(self.__counters__))
+
+    def __sweep__(self):
+        oldest = time.time() - self.ttl
+
+        with self.__lock__:
+            for task_id in list(self.__messages__):
+                messages = self.__messages__[task_id]
+
+                for key in [key for key, state in messages.items() if state[3] < oldest]:
+                    del messages[key]
+
+                if not messages:
+                    del self.__messages__[task_id]
+
+    def __loop__(self):
+        last_sweep = time.time()
+
+        while not self.__kill__.is_set():
+            self.__wakeup__.wait(self.__sweep_interval__)
+
+            try:
+                if self.__wakeup__.is_set():
+                    # Копим изменения delay секунд, чтобы править каждое сообщение один раз
+                    if self.__kill__.wait(self.delay):
+                        break
+
+                    self.__wakeup__.clear()
+                    self.flush()
+
+                if time.time() - last_sweep >= self.__sweep_interval__:
+                    last_sweep = time.time()
+                    self.__sweep__()
+
+            except Exception:
+                # Ошибка одного прохода не должна останавливать обновление сообщений
+                print(traceback.format_exc())
+
+    def log(self, msg, name='MESSAGES'):
+        self.logger.info(f'[{name}]: {msg}')
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import random
+import time
+
+
+class Poller:
+    def __init__(self, min_interval: float = 2, max_interval: float = 30, max_backoff: float = 120,
+                 full_refresh: int = 10, smoothing: float = 0.2):
+        """ Poller | Планировщик опроса freelansim.ru
+
+        Интервал подстраивается под частоту появления новых заказов,
+        ошибки сети увеличивают паузу с джиттером.
+        """
+
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.full_refresh = full_refresh
+
+        self.interval = min_interval
+
+        self.__smoothing__ = smoothing
+        self.__rate__ = 1 / min_interval
+        self.__failures__ = 0
+        self.__polls__ = 0
+        self.__last_poll__ = None
+        self.__last_report__ = time.monotonic()
+
+        self.__history__ = collections.deque()
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+    def delay(self) -> float:
+        """ Сколько секунд ждать до следующего опроса """
+
+        if self.__failures__:
+            return random.uniform(0, min(self.max_backoff, self.min_interval * 2 ** self.__failures__))
+        return self.interval * random.uniform(0.9, 1.1)
+
+    def wait(self):
+        """ Подождать до следующего опроса """
+
+        time.sleep(self.delay())
+
+    @property
+    def is_full(self):
+        """ Нужно ли пройти страницу целиком, а не до первого известного заказа """
+
+        return self.__polls__ % self.full_refresh == 0
+
+    def success(self, new_count: int):
+        """ Опрос прошёл успешно и нашёл new_count новых заказов """
+
+        now = time.monotonic()
+
+        if self.__last_poll__ is not None:
+            elapsed = max(now - self.__last_poll__, 1e-3)
+            self.__rate__ += self.__smoothing__ * (new_count / elapsed - self.__rate__)
+
+        self.__last_poll__ = now
+        self.__failures__ = 0
+        self.__polls__ += 1
+
+        # Ожидаем примерно один новый заказ за опрос
+        if self.__rate__ > 0:
+            self.interval = min(self.max_interval, max(self.min_interval, 1 / self.__rate__))
+        else:
+            self.interval = self.max_interval
+
+        self.__history__.append((now, new_count))
+        self.__report__(now)
+
+    def failure(self):
+        """ Опрос завершился ошибкой сети """
+
+        self.__failures__ += 1
+
+    def metrics(self):
+        """ Опросов и новых заказов за последнюю минуту """
+
+        now = time.monotonic()
+
+        while self.__history__ and now - self.__history__[0][0] > 60:
+            self.__history__.popleft()
+
+        return {
+            'polls_per_minute': len(self.__history__),
+            'new_per_minute': sum(count for _, count in self.__history__),
+            'interval': round(self.interval, 2),
+        }
+
+    def __report__(self, now: float):
+        if now - self.__last_report__ >= 60:
+            self.__last_report__ = now
+            self.log(self.metrics())
+
+    def log(self, msg, name='POLLER'):
+        self.logger.info(f'[{name}]: {msg}')
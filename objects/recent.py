@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import bisect
+import threading
+from typing import Callable
+
+
+class RecentTasks:
+    def __init__(self, limit: int = 15):
+        """ RecentTasks | Последние limit заказов по published_at и кэш их отрисовки """
+
+        self.limit = limit
+
+        self.__keys__ = []
+        self.__tasks__ = {}
+        self.__rendered__ = None
+        self.__lock__ = threading.Lock()
+
+    def push(self, task):
+        """ Учесть новый заказ """
+
+        if task.published_at is None:
+            return
+
+        with self.__lock__:
+            if task.id in self.__tasks__:
+                self.__tasks__[task.id] = task
+                self.__resort__()
+                return
+
+            key = (task.published_at, task.id)
+
+            if len(self.__keys__) >= self.limit and key <= self.__keys__[0]:
+                return
+
+            bisect.insort(self.__keys__, key)
+            self.__tasks__[task.id] = task
+
+            if len(self.__keys__) > self.limit:
+                _, task_id = self.__keys__.pop(0)
+                del self.__tasks__[task_id]
+
+            self.__rendered__ = None
+
+    def invalidate(self, task_id: int):
+        """ Заказ изменился, перерисовать список, если он в него входит """
+
+        if task_id in self.__tasks__:
+            with self.__lock__:
+                self.__resort__()
+
+    def tasks(self):
+        """ Заказы от старых к новым """
+
+        with self.__lock__:
+            return [self.__tasks__[task_id] for _, task_id in self.__keys__]
+
+    def render(self, formatter: Callable):
+        """ formatter(заказы) с кэшированием до следующего изменения списка """
+
+        with self.__lock__:
+            if self.__rendered__ is None:
+                self.__rendered__ = formatter([self.__tasks__[task_id] for _, task_id in self.__keys__])
+
+            return self.__rendered__
+
+    def __resort__(self):
+        self.__tasks__ = {
+            task_id: task for task_id, task in self.__tasks__.items() if task.published_at is not None
+        }
+        self.__keys__ = sorted((task.published_at, task.id) for task in self.__tasks__.values())
+        self.__rendered__ = None
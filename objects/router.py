@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import time
+from typing import Callable
+
+
+class Router:
+    def __init__(self, report_interval: float = 60):
+        """ Router | Маршрутизация текстовых сообщений по (странице пользователя, тексту)
+
+        Обработчик ищется по точному совпадению текста, затем по префиксу,
+        затем берётся обработчик страницы по умолчанию. Маршруты с page=None
+        (команды) проверяются раньше маршрутов страницы.
+        """
+
+        self.__routes__ = {}
+        self.__prefixes__ = collections.defaultdict(dict)
+        self.__defaults__ = {}
+
+        self.__counters__ = collections.Counter()
+        self.__timings__ = collections.defaultdict(float)
+        self.__max_timings__ = collections.defaultdict(float)
+
+        self.__report_interval__ = report_interval
+        self.__last_report__ = time.monotonic()
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+    def add(self, page, handler: Callable, text: str = None, prefix: str = None):
+        """ Зарегистрировать handler(user, text) для страницы page
+
+        :param text: точный текст сообщения
+        :param prefix: начало текста сообщения
+        Без text и prefix handler становится обработчиком страницы по умолчанию.
+        """
+
+        if text is not None:
+            self.__routes__[page, text] = handler
+
+        elif prefix is not None:
+            # Префиксы группируются по первому символу, длинные проверяются первыми
+            prefixes = self.__prefixes__[page].setdefault(prefix[0], [])
+            prefixes.append((prefix, handler))
+            prefixes.sort(key=lambda item: -len(item[0]))
+
+        else:
+            self.__defaults__[page] = handler
+
+    def route(self, page, text: str = None, prefix: str = None):
+        """ Декоратор для add """
+
+        def decorator(handler: Callable):
+            self.add(page, handler, text=text, prefix=prefix)
+            return handler
+
+        return decorator
+
+    def dispatch(self, user, text: str):
+        """ Обработать сообщение: сначала команды, затем маршруты страницы пользователя """
+
+        handler = self.__match__(None, text)
+
+        if handler is None:
+            return self.dispatch_page(user, text)
+
+        return self.__handle__(handler, user, text)
+
+    def dispatch_page(self, user, text: str):
+        """ Обработать сообщение маршрутами страницы пользователя, минуя команды """
+
+        # Страница может нести параметр: choose_sub_subcategory:<категория>
+        page = user.page.partition(':')[0]
+        handler = self.__match__(page, text) or self.__defaults__.get(page)
+
+        if handler is None:
+            self.__counters__['unrouted'] += 1
+            return None
+
+        return self.__handle__(handler, user, text)
+
+    def stats(self):
+        return {
+            name: {
+                'count': count,
+                'avg_ms': round(self.__timings__[name] / count * 1000, 2),
+                'max_ms': round(self.__max_timings__[name] * 1000, 2),
+            } if name in self.__timings__ else count
+            for name, count in self.__counters__.items()
+        }
+
+    def __match__(self, page, text: str):
+        handler = self.__routes__.get((page, text))
+
+        if handler is not None or not text:
+            return handler
+
+        for prefix, handler in self.__prefixes__.get(page, {}).get(text[0], ()):
+            if text.startswith(prefix):
+                return handler
+
+        return None
+
+    def __handle__(self, handler: Callable, user, text: str):
+        name = handler.__name__
+        started = time.monotonic()
+
+        try:
+            return handler(user, text)
+
+        finally:
+            elapsed = time.monotonic() - started
+
+            self.__counters__[name] += 1
+            self.__timings__[name] += elapsed
+            self.__max_timings__[name] = max(self.__max_timings__[name], elapsed)
+
+            if started - self.__last_report__ >= self.__report_interval__:
+                self.__last_report__ = started
+                self.log(self.stats())
+
+    def log(self, msg, name='ROUTER'):
+        self.logger.info(f'[{name}]: {msg}')
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+import json
+from typing import BinaryIO, Iterable, Iterator, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JsonSerializer:
+    name = 'json'
+
+    @staticmethod
+    def dumps(value) -> bytes:
+        """ Компактный JSON в UTF-8, через orjson, если он установлен """
+
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def loads(data: bytes or str):
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def write_snapshot(self, file: BinaryIO, records: Iterable[Tuple[int, dict]]):
+        """ JSON объект, каждая запись на своей строке """
+
+        separator = b'{\n'
+
+        for key, value in records:
+            file.write(separator)
+            file.write(self.dumps(str(key)) + b':' + self.dumps(value))
+            separator = b',\n'
+
+        file.write(b'{\n}\n' if separator == b'{\n' else b'\n}\n')
+
+    def read_snapshot(self, file: BinaryIO) -> Iterator[Tuple[int, dict]]:
+        """ Снимок от write_snapshot построчно, любой другой JSON объект (например,
+        users.json с indent=2 от прежних версий) через ijson или json целиком """
+
+        if file.readline().rstrip(b'\r\n') == b'{':
+            line = file.readline()
+
+            try:
+                first = self.__read_record__(line)
+
+            except ValueError:
+                # Первая строка не запись: это не наш формат
+                first = None
+
+            if first is not None or line.strip() == b'}':
+                if first is not None:
+                    yield first
+
+                for line in file:
+                    record = self.__read_record__(line)
+
+                    if record is None:
+                        break
+
+                    yield record
+
+                return
+
+        file.seek(0)
+
+        if ijson is not None:
+            try:
+                for key, value in ijson.kvitems(file, '', use_float=True):
+                    yield int(key), value
+
+            except ijson.JSONError as error:
+                raise ValueError(error) from error
+
+        else:
+            for key, value in self.loads(file.read()).items():
+                yield int(key), value
+
+    def __read_record__(self, line: bytes):
+        """ Строка "id":{...} -> (id, запись), None на закрывающей скобке """
+
+        line = line.rstrip().rstrip(b',')
+
+        if line == b'}':
+            return None
+
+        # Строка разбирается как объект из одной пары
+        (key, value), = self.loads(b'{' + line + b'}').items()
+        return int(key), value
+
+    def write_log(self, file: BinaryIO, records: Iterable[Tuple[int, dict]]):
+        file.write(b''.join(self.dumps({'id': key, 'data': value}) + b'\n' for key, value in records))
+
+    def read_log(self, file: BinaryIO) -> Iterator[Tuple[int, dict, int]]:
+        """ (id, запись, позиция конца записи в файле) """
+
+        position = 0
+
+        for line in file:
+            position += len(line)
+
+            # Недописанная последняя строка после падения
+            if not line.endswith(b'\n'):
+                break
+
+            try:
+                record = self.loads(line)
+
+            except ValueError:
+                continue
+
+            yield int(record['id']), record['data'], position
+
+
+class MsgpackSerializer:
+    name = 'msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError('msgpack is required for the msgpack serializer')
+
+    @staticmethod
+    def dumps(value) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    @staticmethod
+    def loads(data: bytes):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+    def write_snapshot(self, file: BinaryIO, records: Iterable[Tuple[int, dict]]):
+        """ Поток пар [id, запись], пустой снимок это один пустой массив (0x90) """
+
+        packer = msgpack.Packer(use_bin_type=True)
+        empty = True
+
+        for key, value in records:
+            file.write(packer.pack([key, value]))
+            empty = False
+
+        if empty:
+            file.write(packer.pack([]))
+
+    def read_snapshot(self, file: BinaryIO) -> Iterator[Tuple[int, dict]]:
+        # Недописанная последняя пара просто не выдаётся распаковщиком
+        for record in msgpack.Unpacker(file, raw=False, strict_map_key=False):
+            if record:
+                key, value = record
+                yield int(key), value
+
+    def write_log(self, file: BinaryIO, records: Iterable[Tuple[int, dict]]):
+        packer = msgpack.Packer(use_bin_type=True)
+        file.write(b''.join(packer.pack([key, value]) for key, value in records))
+
+    def read_log(self, file: BinaryIO) -> Iterator[Tuple[int, dict, int]]:
+        """ (id, запись, позиция конца записи в файле) """
+
+        unpacker = msgpack.Unpacker(file, raw=False, strict_map_key=False)
+
+        for key, value in unpacker:
+            yield int(key), value, unpacker.tell()
+
+
+serializers = {
+    'json': JsonSerializer,
+    'msgpack': MsgpackSerializer,
+}
+
+
+def detect(head: bytes, default: str = 'json') -> str:
+    """ Формат файла по первому байту: JSON начинается с '{' или пробела,
+    пары msgpack с маркера массива из двух элементов (0x92), пустой снимок
+    msgpack с пустого массива (0x90). Пустой файл считается форматом default. """
+
+    if not head:
+        return default
+
+    if head[:1] in (b'\x92', b'\x90'):
+        return 'msgpack'
+
+    return 'json'
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from typing import Callable
+
+
+class SharedDict(dict):
+    def __init__(self, *args, **kwargs):
+        """ SharedDict | dict, общий для потоков бота
+
+        Запись идёт под блокировкой, долгие обходы (сохранение, статистика)
+        работают по снимку snapshot() и не мешают обработчикам сообщений.
+        """
+
+        super().__init__(*args, **kwargs)
+        self.__lock__ = threading.RLock()
+
+    def __setitem__(self, key, value):
+        with self.__lock__:
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        with self.__lock__:
+            super().__delitem__(key)
+
+    def pop(self, key, *args):
+        with self.__lock__:
+            return super().pop(key, *args)
+
+    def setdefault(self, key, default=None):
+        with self.__lock__:
+            return super().setdefault(key, default)
+
+    def get_or_create(self, key, factory: Callable):
+        """ Значение по ключу, при отсутствии создаётся factory() ровно один раз
+        :return: (значение, было ли оно создано)
+        """
+
+        value = self.get(key)
+
+        if value is not None:
+            return value, False
+
+        with self.__lock__:
+            value = self.get(key)
+
+            if value is not None:
+                return value, False
+
+            value = factory()
+            super().__setitem__(key, value)
+            return value, True
+
+    def snapshot(self) -> dict:
+        """ Копия словаря, которую можно обходить без блокировок """
+
+        with self.__lock__:
+            return dict(self)
@@ -1,7 +1,11 @@
 # -*- coding: utf-8
 
+import functools
+
 import telegram.ext
 
+from objects.categories import Categories
+
 
 class Static:
     urls = {
@@ -46,8 +50,44 @@ class Static:
         'main': None,
     }
 
+    # Клавиатуры собираются и сериализуются один раз на состояние,
+    # в Telegram уходит готовая JSON строка
+
+    @staticmethod
+    def task_keyboard(task_id, full=False):
+        return Static.__task_keyboard__(int(task_id), full)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def __task_keyboard__(task_id, full):
+        if full:
+            first_line = [
+                telegram.InlineKeyboardButton('Скрыть', callback_data=f'short:{task_id}'),
+                telegram.InlineKeyboardButton('Обновить', callback_data=f'full:{task_id}')
+            ]
+
+        else:
+            first_line = [
+                telegram.InlineKeyboardButton('Подробнее', callback_data=f'full:{task_id}'),
+                telegram.InlineKeyboardButton('Обновить', callback_data=f'short:{task_id}')
+            ]
+
+        return telegram.InlineKeyboardMarkup(
+            [
+                first_line,
+                [
+                    telegram.InlineKeyboardButton('Убрать', callback_data=f'delete:{task_id}')
+                ]
+            ]
+        ).to_json()
+
     @staticmethod
     def main_menu_keyboard(user):
+        return Static.__main_menu_keyboard__(user.has_notifications)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def __main_menu_keyboard__(has_notifications):
         return telegram.ReplyKeyboardMarkup(
             [
                 [telegram.KeyboardButton('Список задач'), ],
@@ -57,33 +97,43 @@ class Static:
                 # ],
                 [
                     telegram.KeyboardButton(
-                        'Включить уведомления' if not user.has_notifications else 'Отключить уведомления'
+                        'Включить уведомления' if not has_notifications else 'Отключить уведомления'
                     )
                 ]
             ], resize_keyboard=True
-        )
+        ).to_json()
 
     @staticmethod
     def auto_answer_keyboard(user):
+        return Static.__auto_answer_keyboard__(user.auto_answer)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def __auto_answer_keyboard__(auto_answer):
         return telegram.ReplyKeyboardMarkup(
             [
                 [
                     telegram.KeyboardButton(
-                        'Включить автоответы' if not user.auto_answer else 'Выключить автоответы'
+                        'Включить автоответы' if not auto_answer else 'Выключить автоответы'
                     )
                 ],
                 [telegram.KeyboardButton('Пример cookies данных'), ],
                 [telegram.KeyboardButton('Назад'), ],
             ], resize_keyboard=True
-        )
+        ).to_json()
 
     @staticmethod
     def choose_category_keyboard(user):
+        return Static.__choose_category_keyboard__(tuple(map(user.has_category, Categories.tree)))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def __choose_category_keyboard__(selected):
         keyboards = []
 
         line = []
-        for category in user.categories:
-            icon = '●' if any(user.categories[category].values()) else '○'
+        for category, has_category in zip(Categories.tree, selected):
+            icon = '●' if has_category else '○'
             line.append(telegram.KeyboardButton(f'{icon} {category}'))
 
             if len(line) == 2:
@@ -98,15 +148,20 @@ class Static:
             telegram.KeyboardButton('Далее')
         ])
 
-        return telegram.ReplyKeyboardMarkup(keyboards, resize_keyboard=True)
+        return telegram.ReplyKeyboardMarkup(keyboards, resize_keyboard=True).to_json()
 
     @staticmethod
     def choose_subcategory_keyboard(user):
+        return Static.__choose_subcategory_keyboard__(tuple(map(user.has_category, Categories.tree)))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def __choose_subcategory_keyboard__(selected):
         keyboards = []
 
         line = []
-        for category in user.categories:
-            if any(user.categories[category].values()):
+        for category, has_category in zip(Categories.tree, selected):
+            if has_category:
                 line.append(telegram.KeyboardButton(f'Выбрать подкатегории в «{category}»'))
 
             if len(line):
@@ -121,17 +176,21 @@ class Static:
             telegram.KeyboardButton('Готово')
         ])
 
-        return telegram.ReplyKeyboardMarkup(keyboards, resize_keyboard=True)
+        return telegram.ReplyKeyboardMarkup(keyboards, resize_keyboard=True).to_json()
 
     @staticmethod
     def choose_sub_subcategory_keyboard(user):
-        keyboards = []
-
         name = user.page.split(':')[1]
+        return Static.__choose_sub_subcategory_keyboard__(name, user.mask & Categories.masks[name])
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def __choose_sub_subcategory_keyboard__(name, mask):
+        keyboards = []
 
         line = []
-        for subcategory in user.categories[name]:
-            icon = '●' if user.categories[name][subcategory] else '○'
+        for subcategory in Categories.tree[name]:
+            icon = '●' if mask & Categories.bit(name, subcategory) else '○'
             line.append(telegram.KeyboardButton(f'{icon} {subcategory}'))
 
             if len(line) == 2:
@@ -145,15 +204,10 @@ class Static:
             telegram.KeyboardButton('Готово')
         ])
 
-        return telegram.ReplyKeyboardMarkup(keyboards, resize_keyboard=True)
+        return telegram.ReplyKeyboardMarkup(keyboards, resize_keyboard=True).to_json()
 
     @staticmethod
-    def format_tasks_list(tasks):
-        last_tasks = list(map(lambda x: tasks[x], sorted(
-            tasks,
-            key=lambda x: tasks[x].published_at
-        )[-15:]))
-
+    def format_tasks_list(last_tasks):
         result = ''
 
         for task in last_tasks:
@@ -167,10 +221,8 @@ class Static:
         return result
 
     @staticmethod
-    def format_stats(tasks, users):
-        users_with_notification = len(list(filter(lambda user_id: users[user_id].has_notifications, users)))
-
+    def format_stats(tasks_count, users_count, users_with_notification):
         return f'*Статистика бота*\n\n' \
-               f'Загруженных задач: *{len(tasks)}*\n' \
-               f'Пользователей: *{len(users)}*\n' \
+               f'Загруженных задач: *{tasks_count}*\n' \
+               f'Пользователей: *{users_count}*\n' \
                f'Подписок на уведомления: *{users_with_notification}*'
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, Set, Tuple
+
+from objects.serializers import JsonSerializer, detect, serializers
+
+
+class JsonStorage:
+    indexed = False
+
+    def __init__(self, root_path: str, compact_ratio: float = 1.0, serializer: str = 'json'):
+        """ JsonStorage | Снимки users.json/tasks.json и журналы изменений *.jsonl
+
+        Новые снимки и журналы пишутся в формате serializer, формат существующих
+        файлов определяется при чтении, и они переписываются при следующем сжатии.
+        """
+
+        self.__routing_path__ = {
+            'root': os.path.join(root_path, 'data'),
+            'users': os.path.join(root_path, 'data', 'users.json'),
+            'users_log': os.path.join(root_path, 'data', 'users.jsonl'),
+            'tasks': os.path.join(root_path, 'data', 'tasks.json'),
+            'tasks_log': os.path.join(root_path, 'data', 'tasks.jsonl'),
+        }
+
+        self.__serializer__ = serializers[serializer]()
+
+        # Форматы файлов на диске, журнал дописывается в своём формате до сжатия
+        self.__formats__ = {name: serializer for name in ('users', 'users_log', 'tasks', 'tasks_log')}
+
+        self.__log_size__ = {'users': 0, 'tasks': 0}
+        self.__compact_ratio__ = compact_ratio
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+        self.__folders_init__()
+
+    def __folders_init__(self):
+        if not os.access(self.__routing_path__['root'], os.F_OK):
+            os.mkdir(self.__routing_path__['root'])
+
+        for name in ('users', 'tasks'):
+            if not os.access(self.__routing_path__[name], os.F_OK):
+                with open(self.__routing_path__[name], 'wb') as file:
+                    self.__serializer__.write_snapshot(file, ())
+
+    def load(self, name: str) -> Iterator[Tuple[int, dict]]:
+        """ Записи снимка по одной, а затем записи журнала
+
+        Журнал ограничен сжатием и читается целиком, записи снимка,
+        которые он перекрывает, пропускаются.
+        """
+
+        journal = self.__read_log__(name)
+
+        for key, value in self.__read_snapshot__(name):
+            if key not in journal:
+                yield key, value
+
+        yield from journal.items()
+
+    def __open__(self, path_name: str):
+        """ Открыть файл на чтение и определить его формат """
+
+        file = open(self.__routing_path__[path_name], 'rb')
+        self.__formats__[path_name] = detect(file.read(1), default=self.__serializer__.name)
+        file.seek(0)
+
+        try:
+            return file, serializers[self.__formats__[path_name]]()
+
+        except RuntimeError:
+            file.close()
+            raise
+
+    def __read_snapshot__(self, name: str) -> Iterator[Tuple[int, dict]]:
+        # Пустой файл (например, снимок msgpack прежних версий) пуст в любом формате
+        if os.path.getsize(self.__routing_path__[name]) == 0:
+            return
+
+        try:
+            file, serializer = self.__open__(name)
+
+            with file:
+                yield from serializer.read_snapshot(file)
+
+        except ValueError:
+            self.log(f'Error loading {name} !')
+
+            # Снимок будет перезаписан при сжатии, нечитаемый файл сохраняем рядом
+            shutil.copyfile(self.__routing_path__[name], f'{self.__routing_path__[name]}.broken')
+
+    def __read_log__(self, name: str) -> Dict[int, dict]:
+        data = {}
+        path = self.__routing_path__[f'{name}_log']
+
+        if os.access(path, os.F_OK):
+            file, serializer = self.__open__(f'{name}_log')
+            end = 0
+
+            with file:
+                for key, value, end in serializer.read_log(file):
+                    data[key] = value
+
+            if end < os.path.getsize(path):
+                # Недописанная запись после падения, иначе новые записи склеятся с ней
+                self.log(f'Skip broken {name} log tail')
+                os.truncate(path, end)
+
+        self.__log_size__[name] = len(data)
+
+        return data
+
+    def get(self, name: str, key: int):
+        return None
+
+    def write(self, name: str, records: Dict[int, dict]):
+        """ Дописать изменённые записи в журнал """
+
+        if not records:
+            return
+
+        serializer = serializers[self.__formats__[f'{name}_log']]()
+
+        with open(self.__routing_path__[f'{name}_log'], mode='ab') as file:
+            serializer.write_log(file, records.items())
+            file.flush()
+            os.fsync(file.fileno())
+
+        self.__log_size__[name] += len(records)
+
+    def need_compact(self, name: str, total: int):
+        # Файлы в другом формате переписываются при первом же сохранении
+        if {self.__formats__[name], self.__formats__[f'{name}_log']} != {self.__serializer__.name}:
+            return True
+
+        return self.__log_size__[name] > max(1000, total * self.__compact_ratio__)
+
+    def compact(self, name: str, records: Iterable[Tuple[int, dict]]):
+        """ Записать снимок коллекции атомарно (temp + rename) и очистить журнал """
+
+        path = self.__routing_path__[name]
+
+        with open(f'{path}.tmp', mode='wb') as file:
+            self.__serializer__.write_snapshot(file, records)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(f'{path}.tmp', path)
+
+        # Журнал очищаем только после того, как снимок на месте
+        open(self.__routing_path__[f'{name}_log'], mode='w').close()
+        self.__log_size__[name] = 0
+        self.__formats__[name] = self.__formats__[f'{name}_log'] = self.__serializer__.name
+
+        self.log(f'Compacted {name}')
+
+    def close(self):
+        pass
+
+    def log(self, msg, name='STORAGE'):
+        self.logger.info(f'[{name}]: {msg}')
+
+
+class SqliteStorage:
+    indexed = True
+
+    schema = '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            has_notifications INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS users_has_notifications ON users (has_notifications);
+
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            category_name TEXT NOT NULL,
+            sub_category_name TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (category_name, sub_category_name, user_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS subscriptions_user_id ON subscriptions (user_id);
+
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            published_at TEXT,
+            category_name TEXT,
+            sub_category_name TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_published_at ON tasks (published_at);
+        CREATE INDEX IF NOT EXISTS tasks_category ON tasks (category_name, sub_category_name);
+    '''
+
+    def __init__(self, root_path: str, preload_tasks: int = 1000, serializer: str = 'json'):
+        """ SqliteStorage | data/data.sqlite3 в режиме WAL с индексами для запросов бота
+
+        Колонка data хранит JSON текстом или msgpack двоичной строкой,
+        формат каждой строки определяется по её типу при чтении.
+        """
+
+        if not os.access(os.path.join(root_path, 'data'), os.F_OK):
+            os.mkdir(os.path.join(root_path, 'data'))
+
+        self.__preload_tasks__ = preload_tasks
+        self.__serializer__ = serializers[serializer]()
+        self.__lock__ = threading.Lock()
+
+        self.__connection__ = sqlite3.connect(
+            os.path.join(root_path, 'data', 'data.sqlite3'), check_same_thread=False, isolation_level=None
+        )
+        self.__connection__.execute('PRAGMA journal_mode=WAL')
+        self.__connection__.execute('PRAGMA synchronous=NORMAL')
+        self.__connection__.executescript(self.schema)
+
+        self.logger = logging.getLogger('freelansim_bot')
+
+    def load(self, name: str, batch_size: int = 1000) -> Iterator[Tuple[int, dict]]:
+        """ Пользователи целиком, заказы только последние preload_tasks, по batch_size строк """
+
+        with self.__lock__:
+            if name == 'tasks':
+                cursor = self.__connection__.execute(
+                    'SELECT id, data FROM tasks ORDER BY published_at DESC LIMIT ?', (self.__preload_tasks__,)
+                )
+
+            else:
+                cursor = self.__connection__.execute(f'SELECT id, data FROM {name}')
+
+        while True:
+            with self.__lock__:
+                rows = cursor.fetchmany(batch_size)
+
+            if not rows:
+                break
+
+            for key, data in rows:
+                yield key, self.__loads__(data)
+
+    def get(self, name: str, key: int):
+        with self.__lock__:
+            row = self.__connection__.execute(f'SELECT data FROM {name} WHERE id = ?', (key,)).fetchone()
+
+        return self.__loads__(row[0]) if row else None
+
+    def write(self, name: str, records: Dict[int, dict]):
+        if not records:
+            return
+
+        with self.__lock__:
+            self.__connection__.execute('BEGIN')
+
+            try:
+                if name == 'users':
+                    self.__write_users__(records)
+                else:
+                    self.__write_tasks__(records)
+
+            except (Exception, BaseException):
+                self.__connection__.execute('ROLLBACK')
+                raise
+
+            self.__connection__.execute('COMMIT')
+
+    def __write_users__(self, records: Dict[int, dict]):
+        self.__connection__.executemany(
+            'INSERT OR REPLACE INTO users (id, has_notifications, data) VALUES (?, ?, ?)',
+            [
+                (key, int(bool(value.get('has_notifications'))), self.__dumps__(value))
+                for key, value in records.items()
+            ]
+        )
+        self.__connection__.executemany(
+            'DELETE FROM subscriptions WHERE user_id = ?', [(key,) for key in records]
+        )
+        self.__connection__.executemany(
+            'INSERT INTO subscriptions (category_name, sub_category_name, user_id) VALUES (?, ?, ?)',
+            [
+                (category_name, sub_category_name, key)
+                for key, value in records.items()
+                for category_name, sub_categories in (value.get('categories') or {}).items()
+                for sub_category_name, status in sub_categories.items() if status
+            ]
+        )
+
+    def __write_tasks__(self, records: Dict[int, dict]):
+        self.__connection__.executemany(
+            'INSERT OR REPLACE INTO tasks (id, published_at, category_name, sub_category_name, data) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [
+                (
+                    key, value.get('published_at'), value.get('category_name'), value.get('sub_category_name'),
+                    self.__dumps__(value)
+                )
+                for key, value in records.items()
+            ]
+        )
+
+    def __dumps__(self, value: dict):
+        data = self.__serializer__.dumps(value)
+        return data.decode('utf-8') if self.__serializer__.name == 'json' else data
+
+    @staticmethod
+    def __loads__(data: str or bytes):
+        if isinstance(data, str):
+            return JsonSerializer.loads(data)
+        return serializers['msgpack']().loads(data)
+
+    def need_compact(self, name: str, total: int):
+        return False
+
+    def compact(self, name: str, records: Iterable[Tuple[int, dict]]):
+        with self.__lock__:
+            self.__connection__.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def count(self, name: str) -> int:
+        with self.__lock__:
+            return self.__connection__.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]
+
+    def count_notifications(self) -> int:
+        with self.__lock__:
+            return self.__connection__.execute(
+                'SELECT COUNT(*) FROM users WHERE has_notifications = 1'
+            ).fetchone()[0]
+
+    def subscribers(self, category_name: str, sub_category_name: str) -> Set[int]:
+        with self.__lock__:
+            rows = self.__connection__.execute(
+                'SELECT subscriptions.user_id FROM subscriptions '
+                'JOIN users ON users.id = subscriptions.user_id '
+                'WHERE subscriptions.category_name = ? AND subscriptions.sub_category_name = ? '
+                'AND users.has_notifications = 1',
+                (category_name, sub_category_name)
+            ).fetchall()
+
+        return {user_id for user_id, in rows}
+
+    def close(self):
+        with self.__lock__:
+            self.__connection__.close()
+
+    def log(self, msg, name='STORAGE'):
+        self.logger.info(f'[{name}]: {msg}')
+
+
+storages = {
+    'json': JsonStorage,
+    'sqlite': SqliteStorage,
+}
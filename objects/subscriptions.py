@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from typing import Dict, Set, Tuple
+
+from objects.categories import Categories
+
+
+class Subscriptions:
+    def __init__(self):
+        """ Индекс подписок | (категория, подкатегория) -> id пользователей с уведомлениями """
+
+        self.__index__: Dict[Tuple[str, str], Set[int]] = {}
+        self.__lock__ = threading.Lock()
+
+    def get(self, category_name: str, sub_category_name: str) -> Set[int]:
+        """ Подписчики подкатегории
+        :return: копия множества id, безопасная для итерации
+        """
+
+        with self.__lock__:
+            return set(self.__index__.get((category_name, sub_category_name), ()))
+
+    def update(self, user, category_name: str, sub_category_name: str):
+        """ Синхронизировать одну подписку пользователя с индексом """
+
+        key = (category_name, sub_category_name)
+        subscribed = user.has_notifications and user.is_subscribed(category_name, sub_category_name)
+
+        with self.__lock__:
+            if subscribed:
+                self.__index__.setdefault(key, set()).add(user.id)
+
+            elif key in self.__index__:
+                self.__index__[key].discard(user.id)
+
+    def update_user(self, user):
+        """ Синхронизировать все подписки пользователя с индексом """
+
+        # Один проход по битам маски под одной блокировкой: вызывается для каждого пользователя при загрузке
+        mask = user.mask if user.has_notifications else 0
+
+        with self.__lock__:
+            for key, bit in Categories.bits.items():
+                if mask & bit:
+                    self.__index__.setdefault(key, set()).add(user.id)
+
+                elif key in self.__index__:
+                    self.__index__[key].discard(user.id)
@@ -1,11 +1,45 @@
 # -*- coding: utf-8
 
 import datetime
+import hashlib
+import json
+import re
+import zlib
 
+from objects.serializers import JsonSerializer
 from objects.static import Static
 
 
 class Task:
+    __slots__ = (
+        'id', 'title', 'price', 'date', 'reply_count', 'has_responded', 'is_marked', 'tags',
+        'safe_deal_only', 'is_publish', 'category_name', 'sub_category_name', 'published_at', 'url',
+        'task_comments_count', 'page_views_count', 'fingerprint', '__description__', '__user__', '__on_change__',
+        '__renders__',
+    )
+
+    # Поля, которые сравнивает update
+    __fields__ = (
+        'title', 'description', 'price', 'has_responded', 'date', 'user',
+        'reply_count', 'page_views_count', 'task_comments_count',
+        'is_publish', 'category_name', 'sub_category_name',
+        'published_at', 'tags',
+    )
+
+    # Тяжёлые поля хранятся сжатыми и распаковываются только при обращении
+    __raw_fields__ = {
+        'description': '__description__',
+        'user': '__user__',
+    }
+
+    # Экранирование описания за один проход: пара переводов строки схлопывается в один
+    __markdown_pattern__ = re.compile(r'(?:<br>|\n){2}|<br>|[*_`]')
+    __markdown_replacements__ = {
+        '*': '•',
+        '_': '-',
+        '`': '"',
+    }
+
     def __init__(self, data=None):
         self.id = data['id']
         self.title = data['title']
@@ -25,28 +59,90 @@ class Task:
         self.url = f'{Static.urls["tasks"]}/{self.id}'
         self.task_comments_count = data.get('task_comments_count')
         self.page_views_count = data.get('page_views_count')
+        self.fingerprint = data.get('fingerprint')
 
         if isinstance(self.published_at, str):
-            self.published_at = datetime.datetime.strptime(self.published_at, '%Y-%m-%dT%H:%M:%S')
+            self.published_at = self.parse_datetime(self.published_at)
+
+        self.__on_change__ = None
+        self.__renders__ = {}
+
+    @staticmethod
+    def parse_datetime(value: str) -> datetime.datetime:
+        """ '2019-06-01T12:30:45[.123][+03:00]' -> datetime(2019, 6, 1, 12, 30, 45)
+
+        Как и раньше, берётся время, указанное в строке, без долей секунды и
+        смещения часового пояса. Первые 19 символов всегда в формате fromisoformat.
+        """
+        return datetime.datetime.fromisoformat(value[:19])
+
+    @staticmethod
+    def format_datetime(value: datetime.datetime) -> str:
+        return value.isoformat(timespec='seconds')
+
+    @staticmethod
+    def fingerprint_of(*payloads) -> bytes:
+        """ Отпечаток сырых данных заказа из API, одинаковый для одинаковых ответов """
+        return hashlib.blake2b(JsonSerializer.dumps(payloads), digest_size=8).digest()
+
+    def set_on_change(self, callback):
+        """ Вызывать callback(task) при каждом изменении заказа """
+        self.__on_change__ = callback
+
+    @property
+    def description(self):
+        return zlib.decompress(self.__description__).decode('utf-8')
+
+    @description.setter
+    def description(self, value: str):
+        self.__description__ = zlib.compress(value.encode('utf-8'))
+
+    @property
+    def user(self):
+        return json.loads(zlib.decompress(self.__user__))
+
+    @user.setter
+    def user(self, value: dict):
+        self.__user__ = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
 
     def update(self, task):
-        keys = [
-            'title', 'description', 'price', 'has_responded', 'date', 'user',
-            'reply_count', 'page_views_count', 'task_comments_count',
-            'is_publish', 'category_name', 'sub_category_name',
-            'published_at', 'tags'
-        ]
-
-        for key in keys:
-            if getattr(self, key) != getattr(task, key):
-                task_label = str(self)
-                print(
-                    'UPDATE', '#', task_label, ' ' * (120 - len(task_label)), '|', key + ':\t',
-                    getattr(self, key), getattr(task, key)
-                )
-                setattr(self, key, getattr(task, key))
+        """ Перенести изменившиеся поля из task
+        :return: {поле: (старое значение, новое значение)}
+        """
+
+        diff = {}
+
+        for key in self.__fields__:
+            attr = self.__raw_fields__.get(key, key)
+
+            # Сжатые поля сравниваются без распаковки
+            if getattr(self, attr) != getattr(task, attr):
+                diff[key] = (getattr(self, key), getattr(task, key))
+                setattr(self, attr, getattr(task, attr))
+
+        self.fingerprint = task.fingerprint
+
+        if diff:
+            self.__renders__ = {}
+
+            if self.__on_change__ is not None:
+                self.__on_change__(self)
+
+        return diff
 
     def format_message(self, full=False, event=False):
+        key = (full, event)
+
+        # update() заменяет словарь: отрисовка по старым полям попадёт в старый словарь
+        renders = self.__renders__
+        message = renders.get(key)
+
+        if message is None:
+            message = renders[key] = self.__format_message__(full, event)
+
+        return message
+
+    def __format_message__(self, full: bool, event: bool):
         odds = '✅ ' if self.reply_count < 4 else (
             '❔ ' if self.reply_count < 8 else '❌ '
         )
@@ -92,17 +188,18 @@ class Task:
         return f'{value} в час'
 
     def format_user(self):
-        rating = self.user["rating"] if self.user["rating"] else ''
+        user = self.user
+        rating = user["rating"] if user["rating"] else ''
 
-        if self.user["firstname"]:
-            if self.user["lastname"]:
-                name = f'{self.user["firstname"]} {self.user["lastname"]}'
+        if user["firstname"]:
+            if user["lastname"]:
+                name = f'{user["firstname"]} {user["lastname"]}'
             else:
-                name = self.user["firstname"]
+                name = user["firstname"]
         else:
             name = 'Без имени'
 
-        return f'{name} | [{self.user["username"]}]({Static.urls["freelancers"]}/{self.user["username"]}) {rating}'
+        return f'{name} | [{user["username"]}]({Static.urls["freelancers"]}/{user["username"]}) {rating}'
 
     def format_description(self, max_count: int):
         result = []
@@ -113,13 +210,11 @@ class Task:
             result.append(word)
             length += len(word) + 1
 
-        return '\n'.join(result).replace(
-            '<br>', '\n').replace(
-            '*', '•').replace(
-            '_', '-').replace(
-            '`', '"').replace(
-            '\n\n', '\n'
-        ).strip()
+        return self.__markdown_pattern__.sub(self.__escape__, '\n'.join(result)).strip()
+
+    @classmethod
+    def __escape__(cls, match):
+        return cls.__markdown_replacements__.get(match.group(0), '\n')
 
     def json(self):
         return {
@@ -137,7 +232,7 @@ class Task:
             'is_publish': self.is_publish,
             'category_name': self.category_name,
             'sub_category_name': self.sub_category_name,
-            'published_at': self.published_at.strftime('%Y-%m-%dT%H:%M:%S') if self.published_at is not None else None,
+            'published_at': self.format_datetime(self.published_at) if self.published_at is not None else None,
             'url': self.url,
             'task_comments_count': self.task_comments_count,
             'page_views_count': self.page_views_count,
@@ -1,8 +1,15 @@
 # -*- coding: utf-8 -*-
 
+from objects.categories import Categories
+
 
 class User:
-    def __init__(self, user_data: dict):
+    __slots__ = (
+        'id', 'first_name', 'last_name', 'username', 'is_bot', 'language_code', 'page',
+        'auto_answer', 'has_notifications', 'mask', '__subscriptions__', '__on_change__',
+    )
+
+    def __init__(self, user_data: dict, subscriptions=None):
         self.id = user_data['id']
 
         self.first_name = user_data.get('first_name')
@@ -17,102 +24,72 @@ class User:
         self.auto_answer = bool(user_data.get('auto_answer'))
         self.has_notifications = bool(user_data.get('has_notifications'))
 
-        self.categories = user_data.get('categories')
-
-        if user_data.get('categories') is None:
-            self.categories = {
-                'Разработка': {
-                    'Сайты «под ключ»': False,
-                    'Бэкенд': False,
-                    'Фронтенд': False,
-                    'Прототипирование': False,
-                    'iOS': False,
-                    'Android': False,
-                    'Десктопное ПО': False,
-                    'Боты и парсинг данных': False,
-                    'Разработка игр': False,
-                    '1С-программирование': False,
-                    'Скрипты и плагины': False,
-                    'Разное': False,
-                },
-                'Тестирование': {
-                    'Сайты': False,
-                    'Мобайл': False,
-                    'Софт': False,
-                },
-                'Администрирование': {
-                    'Серверы': False,
-                    'Компьютерные сети': False,
-                    'Базы данных': False,
-                    'Защита ПО и безопасность': False,
-                    'Разное': False,
-                },
-                'Дизайн': {
-                    'Сайты': False,
-                    'Лендинги': False,
-                    'Логотипы': False,
-                    'Рисунки и иллюстрации': False,
-                    'Мобильные приложения': False,
-                    'Иконки': False,
-                    'Полиграфия': False,
-                    'Баннеры': False,
-                    'Векторная графика': False,
-                    'Фирменный стиль': False,
-                    'Презентации': False,
-                    '3D': False,
-                    'Анимация': False,
-                    'Обработка фото': False,
-                    'Разное': False,
-                },
-                'Контент': {
-                    'Копирайтинг': False,
-                    'Рерайтинг': False,
-                    'Расшифровка аудио и видео': False,
-                    'Статьи и новости': False,
-                    'Сценарии': False,
-                    'Нейминг и слоганы': False,
-                    'Редактура и корректура': False,
-                    'Переводы': False,
-                    'Рефераты, дипломы, курсовые': False,
-                    'Техническая документация': False,
-                    'Контент-менеджмент': False,
-                    'Разное': False,
-                },
-                'Маркетинг': {
-                    'SMM': False,
-                    'SEO': False,
-                    'Контекстная реклама': False,
-                    'E-mail маркетинг': False,
-                    'Исследования рынка и опросы': False,
-                    'Продажи и генерация лидов': False,
-                    'PR-менеджмент': False,
-                    'Разное': False,
-                },
-                'Разное': {
-                    'Аудит и аналитика': False,
-                    'Консалтинг': False,
-                    'Юриспруденция': False,
-                    'Бухгалтерские услуги': False,
-                    'Аудио': False,
-                    'Видео': False,
-                    'Инженерия': False,
-                    'Разное': False,
-                },
-            }
+        # Подписки хранятся битовой маской, см. Categories
+        self.mask = Categories.from_dict(user_data.get('categories') or {})
+
+        self.__subscriptions__ = subscriptions
+        self.__on_change__ = None
+
+        if self.__subscriptions__ is not None:
+            self.__subscriptions__.update_user(self)
+
+    def set_on_change(self, callback):
+        """ Вызывать callback(user) при каждом изменении пользователя """
+        self.__on_change__ = callback
+
+    def __changed__(self):
+        if self.__on_change__ is not None:
+            self.__on_change__(self)
 
     def set_notifications(self, sign: bool):
         self.has_notifications = sign
 
+        if self.__subscriptions__ is not None:
+            self.__subscriptions__.update_user(self)
+
+        self.__changed__()
+
     def set_page(self, page: str):
         self.page = page
+        self.__changed__()
 
     def set_category(self, name: str, status: bool):
-        if self.categories.get(name):
-            for subcategory in self.categories[name]:
-                self.categories[name][subcategory] = status
+        if name in Categories.masks:
+            if status:
+                self.mask |= Categories.masks[name]
+            else:
+                self.mask &= ~Categories.masks[name]
+
+            if self.__subscriptions__ is not None:
+                for subcategory in Categories.tree[name]:
+                    self.__subscriptions__.update(self, name, subcategory)
+
+            self.__changed__()
 
     def set_subcategory(self, name: str, subcategory: str, status: bool):
-        self.categories[name][subcategory] = status
+        bit = Categories.bit(name, subcategory)
+
+        if bit:
+            if status:
+                self.mask |= bit
+            else:
+                self.mask &= ~bit
+
+            if self.__subscriptions__ is not None:
+                self.__subscriptions__.update(self, name, subcategory)
+
+            self.__changed__()
+
+    def is_subscribed(self, category_name: str, sub_category_name: str):
+        return bool(self.mask & Categories.bit(category_name, sub_category_name))
+
+    def has_category(self, name: str):
+        return bool(self.mask & Categories.masks.get(name, 0))
+
+    @property
+    def categories(self):
+        """ Подписки в виде {категория: {подкатегория: bool}} """
+        return Categories.to_dict(self.mask)
 
     def __repr__(self):
         return '<User %s | %s %s | %s | %s >' % (
@@ -125,9 +102,15 @@ class User:
             'is_bot', 'language_code',
         ]
 
+        changed = False
+
         for key in keys:
             if getattr(self, key) != user_data.get(key):
                 setattr(self, key, user_data.get(key))
+                changed = True
+
+        if changed:
+            self.__changed__()
 
     def json(self):
         return {
@@ -140,5 +123,5 @@ class User:
             'page': self.page,
             'has_notifications': self.has_notifications,
             'auto_answer': self.auto_answer,
-            'categories': self.categories
+            'categories': Categories.selected(self.mask)
         }
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+import types
+
+from objects.cache import TaskCache
+
+
+def test_pins_do_not_leak():
+    cache = TaskCache(grace=0, sweep_interval=0)
+    cache[1] = types.SimpleNamespace(id=1, published_at=None)
+
+    # /start taskId_<n> с любым n не должен оставлять закреплений
+    for task_id in range(2, 1000):
+        cache.touch(task_id)
+
+    cache.touch(1)
+    assert list(cache.__pinned__) == [1]
+
+    # Истёкшие закрепления убираются при очистке по TTL
+    cache[2] = types.SimpleNamespace(id=2, published_at=None)
+    assert cache.__pinned__ == {}
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+import time
+import types
+
+import telegram.error
+
+from objects.delivery import Delivery
+from objects.messages import TaskMessages
+
+
+class FakeTelegram:
+    def __init__(self, failures: int = 0):
+        self.edits = []
+        self.failures = failures
+
+    def edit_message_text(self, chat_id=None, message_id=None, text=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise telegram.error.NetworkError('timeout')
+
+        self.edits.append((chat_id, message_id, text))
+        return types.SimpleNamespace(chat_id=chat_id, message_id=message_id)
+
+
+def wait_idle(delivery: Delivery, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+
+    while (delivery.stats()['queue'] or delivery.__pending__) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # Воркер мог забрать последнюю отправку, но ещё не закончить её
+    time.sleep(0.05)
+
+
+def submit_edit(delivery: Delivery, chat_id: int, message_id: int, text: str):
+    return delivery.submit(
+        chat_id, method='edit_message_text', key=f'edit:{message_id}', replace=True,
+        message_id=message_id, text=text,
+    )
+
+
+def test_queued_edit_is_replaced():
+    bot = FakeTelegram()
+    delivery = Delivery(bot, workers=1, global_rate=1000, chat_rate=1000)
+
+    for chat_id in (1, 2):
+        for version in range(10):
+            submit_edit(delivery, chat_id, 7, f'v{version}')
+
+    assert delivery.stats()['queue'] == 2
+    assert delivery.stats()['replaced'] == 18
+
+    delivery.run()
+    wait_idle(delivery)
+
+    assert sorted(bot.edits) == [(1, 7, 'v9'), (2, 7, 'v9')]
+
+    # После доставки то же сообщение можно править снова
+    assert submit_edit(delivery, 1, 7, 'v10')
+    wait_idle(delivery)
+    delivery.stop()
+
+    assert bot.edits[-1] == (1, 7, 'v10')
+
+
+def test_retry_yields_to_newer_edit():
+    bot = FakeTelegram(failures=1)
+    delivery = Delivery(bot, workers=1, global_rate=1000, chat_rate=1000)
+    delivery.run()
+
+    submit_edit(delivery, 1, 7, 'old')
+
+    # Пока первая попытка ждёт повтора, приходит новая правка
+    while bot.failures:
+        time.sleep(0.001)
+    submit_edit(delivery, 1, 7, 'new')
+
+    wait_idle(delivery)
+    delivery.stop()
+
+    assert bot.edits == [(1, 7, 'new')]
+
+
+def test_keyed_sends_are_still_sent_once():
+    bot = FakeTelegram()
+    delivery = Delivery(bot, workers=1, global_rate=1000, chat_rate=1000)
+
+    assert delivery.submit(1, method='edit_message_text', key='task:1', message_id=1, text='a')
+    assert not delivery.submit(1, method='edit_message_text', key='task:1', message_id=1, text='b')
+
+    delivery.run()
+    wait_idle(delivery)
+
+    assert not delivery.submit(1, method='edit_message_text', key='task:1', message_id=1, text='c')
+    delivery.stop()
+
+    assert bot.edits == [(1, 1, 'a')]
+
+
+def test_task_message_edits_do_not_pile_up():
+    delivery = Delivery(FakeTelegram())
+    task = types.SimpleNamespace(reply_count=0)
+    task.format_message = lambda full=False, event=False: f'Откликов: {task.reply_count}'
+
+    messages = TaskMessages(lambda task_id: task, delivery.submit)
+
+    for chat_id in range(100):
+        messages.track(1, chat_id, chat_id + 1000, task.format_message())
+
+    # Заказ меняется чаще, чем очередь успевает отправлять правки
+    for reply_count in range(1, 6):
+        task.reply_count = reply_count
+        messages.changed(1, {'reply_count': (reply_count - 1, reply_count)})
+        messages.flush()
+
+    assert delivery.stats()['queue'] == 100
+    assert {job.kwargs['text'] for _, _, job in delivery.__queue__.queue} == {'Откликов: 5'}
+
+
+def test_task_messages_loop_survives_errors(capsys):
+    submitted = []
+    task = types.SimpleNamespace(reply_count=0)
+    task.format_message = lambda full=False, event=False: f'Откликов: {task.reply_count}'
+
+    def get_task(task_id):
+        if task.reply_count == 1:
+            raise RuntimeError('cache is broken')
+        return task
+
+    messages = TaskMessages(get_task, lambda *args, **kwargs: submitted.append(kwargs['text']), delay=0.01)
+    messages.track(1, 1, 1000, task.format_message())
+    messages.run()
+
+    for reply_count in (1, 2):
+        task.reply_count = reply_count
+        messages.changed(1, {'reply_count': (reply_count - 1, reply_count)})
+        time.sleep(0.2)
+
+    messages.stop()
+
+    assert 'RuntimeError: cache is broken' in capsys.readouterr().out
+    assert submitted == ['Откликов: 2']
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+import pytest
+
+from objects import serializers
+from objects.cache import TaskCache
+from objects.categories import Categories
+from objects.database import Database
+from objects.state import SharedDict
+from objects.storage import JsonStorage
+from objects.subscriptions import Subscriptions
+from objects.user import User
+
+
+@pytest.fixture(params=['ijson', 'json'])
+def reader(request, monkeypatch):
+    """ Снимки, которые не построчные, читаются через ijson, а без него через json целиком """
+
+    if request.param == 'json':
+        monkeypatch.setattr(serializers, 'ijson', None)
+    elif serializers.ijson is None:
+        pytest.skip('ijson is not installed')
+
+    return request.param
+
+
+def baseline_user(user_id: int, categories: dict = None):
+    """ Пользователь, как его сохраняли версии до журналов: все подкатегории словарём """
+
+    return {
+        'id': user_id,
+        'first_name': f'Имя {user_id}',
+        'last_name': None,
+        'username': f'user{user_id}',
+        'is_bot': False,
+        'language_code': 'ru',
+        'page': 'main',
+        'has_notifications': True,
+        'auto_answer': False,
+        'categories': Categories.to_dict(Categories.from_dict(categories or {})),
+    }
+
+
+def write_data(root_path, name: str, content: str):
+    os.makedirs(root_path / 'data', exist_ok=True)
+    (root_path / 'data' / name).write_text(content, encoding='utf-8')
+
+
+def test_load_baseline_users_json(tmp_path, reader):
+    users = {
+        str(user_id): baseline_user(user_id, {'Разработка': {'Бэкенд': True}})
+        for user_id in (101, 102, 103)
+    }
+
+    # Так писал Database.save_data до журналов
+    write_data(tmp_path, 'users.json', json.dumps(users, ensure_ascii=False, indent=2))
+    write_data(tmp_path, 'tasks.json', json.dumps({}))
+
+    loaded, subscriptions = SharedDict(), Subscriptions()
+    Database(loaded, TaskCache(), str(tmp_path), subscriptions).load_data()
+
+    assert sorted(loaded) == [101, 102, 103]
+    assert loaded[102].username == 'user102'
+    assert subscriptions.get('Разработка', 'Бэкенд') == {101, 102, 103}
+
+
+def test_snapshot_round_trip(tmp_path, reader):
+    storage = JsonStorage(str(tmp_path))
+    records = [(user_id, baseline_user(user_id)) for user_id in range(5)]
+
+    storage.compact('users', iter(records))
+
+    assert list(JsonStorage(str(tmp_path)).load('users')) == records
+
+
+@pytest.mark.parametrize('content', ['{"1": {"id": 1', '{', '{\n"1":'])
+def test_broken_snapshot_is_kept(tmp_path, reader, content):
+    write_data(tmp_path, 'users.json', content)
+
+    assert list(JsonStorage(str(tmp_path)).load('users')) == []
+    assert (tmp_path / 'data' / 'users.json.broken').read_text(encoding='utf-8') == content
+
+
+@pytest.mark.parametrize('written, configured', [('msgpack', 'json'), ('json', 'msgpack')])
+@pytest.mark.parametrize('count', [0, 3])
+def test_switch_serializer(tmp_path, written, configured, count):
+    if serializers.msgpack is None:
+        pytest.skip('msgpack is not installed')
+
+    records = [(user_id, baseline_user(user_id)) for user_id in range(count)]
+
+    storage = JsonStorage(str(tmp_path), serializer=written)
+    storage.compact('users', iter(records))
+    storage.write('users', {100: baseline_user(100)})
+
+    storage = JsonStorage(str(tmp_path), serializer=configured)
+
+    assert list(storage.load('users')) + list(storage.load('tasks')) == records + [(100, baseline_user(100))]
+    assert storage.need_compact('users', count + 1)
+    assert not any(name.endswith('.broken') for name in os.listdir(tmp_path / 'data'))
+
+
+def test_empty_file_has_no_records(tmp_path):
+    write_data(tmp_path, 'users.json', '')
+
+    assert list(JsonStorage(str(tmp_path)).load('users')) == []
+    assert not os.access(tmp_path / 'data' / 'users.json.broken', os.F_OK)
+
+
+@pytest.mark.parametrize('lazy_users', [False, True])
+def test_sqlite_subscribers_without_full_save(tmp_path, lazy_users):
+    users, subscriptions = SharedDict(), Subscriptions()
+    database = Database(users, TaskCache(), str(tmp_path), subscriptions, storage='sqlite', lazy_users=lazy_users)
+
+    user = User(baseline_user(1, {'Разработка': {'Бэкенд': True}}), subscriptions)
+    database.add_user(user)
+
+    assert database.subscribers('Разработка', 'Бэкенд') == {1}
+
+    # Рассылка не запускает полное сохранение, в худшем случае дописывает пользователей
+    assert database.has_changes
+    assert bool(database.__dirty__['users']) != lazy_users
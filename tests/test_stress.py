@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+"""
+Нагрузочный тест общего состояния: обработчики сообщений, long_polling, рассылка
+и Database.save_data одновременно работают с SharedDict пользователей и TaskCache заказов
+
+    python -m pytest tests/test_stress.py
+"""
+
+import itertools
+import json
+import os
+import random
+import shutil
+import threading
+import time
+import types
+
+import pytest
+
+import bot as bot_module
+from objects.cache import TaskCache
+from objects.categories import Categories
+from objects.database import Database
+from objects.debounce import ReplyDebouncer
+from objects.delivery import Delivery
+from objects.state import SharedDict
+from objects.subscriptions import Subscriptions
+
+DURATION = 3
+USERS = 200
+
+TEXTS = (
+    '/start', 'Список задач', '/stats', 'Включить уведомления', 'Выбор категорий',
+    *(f'○ {name}' for name in Categories.tree), *(f'● {name}' for name in Categories.tree),
+    'Назад', 'Отключить уведомления', '/tasks', 'Включить уведомления',
+)
+
+
+class FakeTelegram:
+    """ telegram.Bot, который только считает вызовы """
+
+    def __init__(self):
+        self.counter = itertools.count(1)
+        self.calls = 0
+
+    def send_message(self, chat_id, text=None, **kwargs):
+        self.calls += 1
+        return types.SimpleNamespace(chat_id=chat_id, message_id=next(self.counter))
+
+    def edit_message_text(self, chat_id=None, message_id=None, text=None, **kwargs):
+        self.calls += 1
+        return types.SimpleNamespace(chat_id=chat_id, message_id=message_id)
+
+    def delete_message(self, chat_id, message_id):
+        self.calls += 1
+
+
+class FakeFreelansim:
+    """ requests.Session для страницы заказов: каждый запрос приносит пару новых заказов
+    и меняет число откликов у старых """
+
+    def __init__(self):
+        self.next_id = 1
+        self.polls = 0
+        self.stopped = False
+        self.__lock__ = threading.Lock()
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        if self.stopped:
+            # Штатная остановка long_polling: __exit__ сохраняет всё на диск
+            raise KeyboardInterrupt
+
+        with self.__lock__:
+            if headers.get('X-Version') == '1':
+                self.polls += 1
+                self.next_id += 2
+
+            last_id, polls = self.next_id, self.polls
+
+        ids = range(last_id, max(0, last_id - 50), -1)
+        categories = list(Categories.bits)
+
+        if headers.get('X-Version') == '1':
+            content = {'tasks': [{
+                'id': task_id,
+                'title': f'Заказ {task_id}',
+                'description': 'Описание *заказа*\n' * 5,
+                'price': {'type': 'per_project', 'value': f'{task_id % 50 + 1} 000 руб.'},
+                'date': '5 мин.',
+                'reply_count': (polls + task_id) % 12,
+                'has_responded': False,
+                'is_marked': False,
+                'tags': [{'name': 'python'}],
+                'safe_deal_only': False,
+                'user': {
+                    'username': f'user{task_id}', 'firstname': 'Имя', 'lastname': None, 'rating': 1.5,
+                    'avatar': {'src': '/assets/a.png', 'src2x': '/assets/b.png'},
+                },
+            } for task_id in ids]}
+
+        else:
+            content = [{
+                'id': task_id,
+                'is_publish': True,
+                'category_name': categories[task_id % len(categories)][0],
+                'sub_category_name': categories[task_id % len(categories)][1],
+                'published_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'url': f'/tasks/{task_id}',
+                'task_comments_count': 0,
+                'page_views_count': polls,
+            } for task_id in ids]
+
+        return types.SimpleNamespace(status_code=200, headers={}, content=json.dumps(content).encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def freelansim_bot(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(os.path.dirname(bot_module.__file__), 'config.json'), tmp_path)
+
+    # Данные бота пишутся во временную папку
+    monkeypatch.setattr(bot_module, '__file__', str(tmp_path / 'bot.py'))
+
+    instance = bot_module.FreelansimBot()
+
+    telegram_bot = FakeTelegram()
+    instance.__tg_bot__ = telegram_bot
+    instance.__replies__ = ReplyDebouncer(telegram_bot.send_message, delay=0.01)
+    instance.__delivery__ = Delivery(
+        telegram_bot, workers=4, global_rate=100000, chat_rate=100000, on_blocked=instance.__on_blocked__
+    )
+    instance.__session__ = FakeFreelansim()
+    instance.__poller__.min_interval = instance.__poller__.interval = 0.01
+    instance.__poller__.max_interval = instance.__poller__.max_backoff = 0.05
+    instance.__task_messages__.delay = 0.05
+
+    return instance, telegram_bot, tmp_path
+
+
+def test_shared_state_under_load(freelansim_bot, capsys):
+    instance, telegram_bot, root_path = freelansim_bot
+
+    stop = threading.Event()
+    errors = []
+
+    def worker(target):
+        def run():
+            random.seed(threading.get_ident())
+
+            while not stop.is_set():
+                try:
+                    target()
+
+                except Exception as error:
+                    errors.append(error)
+                    raise
+
+        return threading.Thread(target=run, daemon=True)
+
+    def message():
+        user_id = random.randrange(USERS)
+        instance.__message_handler__(None, types.SimpleNamespace(message=types.SimpleNamespace(
+            from_user=types.SimpleNamespace(to_dict=lambda: {'id': user_id, 'first_name': f'name{user_id}'}),
+            text=random.choice(TEXTS),
+        )))
+
+    def query():
+        task_ids = instance.__tasks__.keys()
+
+        if task_ids:
+            instance.__query_handler__(None, types.SimpleNamespace(callback_query=types.SimpleNamespace(
+                data=f'{random.choice(("full", "short"))}:{random.choice(task_ids)}',
+                answer=lambda text: None,
+                edit_message_text=lambda **kwargs: None,
+                message=types.SimpleNamespace(chat_id=random.randrange(USERS), message_id=random.randrange(1000)),
+            )))
+
+    def fan_out():
+        # Как прежние потоки на каждый новый заказ: рассылка параллельно с опросом
+        task_ids = instance.__tasks__.keys()
+
+        if task_ids:
+            instance.__event_new_task__(random.choice(task_ids))
+
+        time.sleep(0.001)
+
+    def save():
+        instance.__db__.save_data()
+        instance.__db__.stats()
+        time.sleep(0.01)
+
+    threads = [
+        *(worker(message) for _ in range(8)),
+        *(worker(query) for _ in range(2)),
+        *(worker(fan_out) for _ in range(4)),
+        worker(save),
+    ]
+
+    instance.__delivery__.run()
+    instance.__task_messages__.run()
+
+    def long_polling():
+        # __exit__ завершает процесс через exit(), здесь только поток
+        with pytest.raises(SystemExit):
+            instance.long_polling()
+
+    polling = threading.Thread(target=long_polling, daemon=True)
+    polling.start()
+
+    for thread in threads:
+        thread.start()
+
+    time.sleep(DURATION)
+    stop.set()
+
+    for thread in threads:
+        thread.join(10)
+
+    # long_polling завершается через __exit__, как при Ctrl+C
+    instance.__session__.stopped = True
+    polling.join(10)
+
+    assert not errors
+    assert not polling.is_alive()
+
+    # long_polling, TaskMessages и воркеры Delivery печатают ошибки и продолжают работу
+    assert 'Traceback' not in capsys.readouterr().out
+    assert instance.__session__.polls > 10
+    assert telegram_bot.calls > 0
+    assert instance.__delivery__.stats().get('error', 0) == 0
+
+    users = instance.__users__.snapshot()
+    assert len(users) == USERS
+
+    # Индекс подписок совпадает с подписками пользователей
+    for (category_name, sub_category_name), subscribers in instance.__subscriptions__.__index__.items():
+        assert subscribers == {
+            user.id for user in users.values()
+            if user.has_notifications and user.is_subscribed(category_name, sub_category_name)
+        }
+
+    # Сохранённое на диск совпадает с памятью
+    reloaded_users, reloaded_tasks = SharedDict(), TaskCache()
+    Database(reloaded_users, reloaded_tasks, str(root_path), Subscriptions()).load_data()
+
+    assert {key: user.json() for key, user in reloaded_users.items()} == {
+        key: user.json() for key, user in users.items()
+    }
+    assert set(reloaded_tasks.keys()) >= set(instance.__tasks__.keys())